@@ -164,3 +164,40 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Recommender artifacts (trek embedding matrix and friends)
+RECOMMENDER_DATA_DIR = os.getenv("RECOMMENDER_DATA_DIR", os.path.join(BASE_DIR, 'recommender_data'))
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_md")
+# Share of the collaborative-filtering score in blended recommendations
+RECOMMENDER_CF_WEIGHT = float(os.getenv("RECOMMENDER_CF_WEIGHT", "0.3"))
+# Clustered (IVF) candidate search kicks in above this catalog size
+RECOMMENDER_IVF_MIN_TREKS = int(os.getenv("RECOMMENDER_IVF_MIN_TREKS", "1000"))
+RECOMMENDER_IVF_PROBES = int(os.getenv("RECOMMENDER_IVF_PROBES", "4"))
+# Neighbours kept per trek in the similar-treks table
+SIMILAR_TREKS_COUNT = int(os.getenv("SIMILAR_TREKS_COUNT", "10"))
+# Load the recommender in the gunicorn master (requires --preload)
+RECOMMENDER_PRELOAD = os.getenv("RECOMMENDER_PRELOAD", "False") == "True"
+
+# Two cache tiers: a per-process LRU ("default") in front of a cache shared
+# by all workers ("shared"), which also carries the catalog version
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'treknepal',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "500"))},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("SHARED_CACHE_DIR", os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "5000"))},
+    },
+}
+# Cached trek list/detail responses (keyed by catalog version, so this only bounds memory)
+TREK_RESPONSE_CACHE_TIMEOUT = int(os.getenv("TREK_RESPONSE_CACHE_TIMEOUT", "3600"))
+# Seconds a worker may trust the shared catalog version before re-reading the database
+CATALOG_VERSION_CACHE_TIMEOUT = int(os.getenv("CATALOG_VERSION_CACHE_TIMEOUT", "60"))
+# /api/batch/: sub-requests per batch, and threads running them
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'treknepal.settings')
 
 application = get_wsgi_application()
+
+# Under `gunicorn --preload` this module is imported once in the master, so
+# anything loaded here is shared copy-on-write by the forked workers.
+from django.conf import settings
+
+if settings.RECOMMENDER_PRELOAD:
+    from treks.recommend import preload
+    preload()
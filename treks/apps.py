@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    from .search import ensure_search_index
+
+    ensure_search_index(using)
 
 
 class TreksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'treks'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(restore_search_index, sender=self)
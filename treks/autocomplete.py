@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import time
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+import marisa_trie
+from django.conf import settings
+from django.db.models import Count, Sum
+from .models import Trek, Favorite, UserTrekInteraction
+from .catalog import get_catalog_epoch, get_catalog_version, cached_catalog_state
+from .recommend import flatten_list
+
+AUTOCOMPLETE_META_FILE = "autocomplete.json"
+AUTOCOMPLETE_TRIE_FILE = "autocomplete.{generation}.marisa"
+# Record per key: entry id, popularity weight, 1 if the key is the label's start
+AUTOCOMPLETE_RECORD_FORMAT = "<IfB"
+
+_non_word = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+def normalize_label(text):
+    """Lowercased label without accents or punctuation, single-spaced."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_non_word.sub(" ", text.lower()).split())
+
+
+def trek_popularity():
+    """Trek id -> 1 + summed interaction weights + favourites."""
+    popularity = defaultdict(lambda: 1.0)
+    for row in UserTrekInteraction.objects.values('trek_id').annotate(weight=Sum('interaction_weight')):
+        popularity[row['trek_id']] += max(row['weight'] or 0, 0)
+    for row in Favorite.objects.values('trek_id').annotate(count=Count('id')):
+        popularity[row['trek_id']] += row['count']
+    return popularity
+
+
+class AutocompleteIndex:
+    """
+    Prefix index over trek names, itinerary villages and nearby attractions.
+    Every word suffix of a label is a key ("base camp" finds "Everest Base
+    Camp Trek") mapping to a compact record of the entry id and its
+    popularity; `entries` holds (label, type, trek ids) per entry id.
+    `generation` identifies the saved build (its save time in ns, 0 until
+    saved): rebuilds at the same catalog version, after popularity shifted,
+    get a new one.
+    """
+
+    def __init__(self, trie, entries, version=0, epoch=None, generation=0):
+        self.trie = trie
+        self.entries = entries
+        self.version = version
+        self.epoch = epoch
+        self.generation = generation
+
+    @classmethod
+    def build(cls, version=None):
+        if version is None:
+            version = get_catalog_version()
+        popularity = trek_popularity()
+
+        # normalised label -> [label, type, trek ids]; a trek name wins over a place of the same name
+        labels = {}
+        kinds = ('trek', 'place', 'attraction')
+        for trek in Trek.objects.only('id', 'name', 'itinerary_points', 'nearby_attractions').order_by('id'):
+            names = [('trek', trek.name)]
+            names += [('place', point.get('name')) for point in trek.itinerary_points or [] if isinstance(point, dict)]
+            names += [('attraction', name) for name in flatten_list(trek.nearby_attractions)]
+            for kind, label in names:
+                key = normalize_label(label or '')
+                if not key:
+                    continue
+                entry = labels.setdefault(key, [label.strip(), kind, []])
+                if kinds.index(kind) < kinds.index(entry[1]):
+                    entry[0], entry[1] = label.strip(), kind
+                if trek.id not in entry[2]:
+                    entry[2].append(trek.id)
+
+        entries = []
+        records = []
+        for key, (label, kind, trek_ids) in sorted(labels.items()):
+            # Most popular treks first; the entry is as popular as its treks together
+            trek_ids.sort(key=lambda trek_id: -popularity[trek_id])
+            weight = float(sum(popularity[trek_id] for trek_id in trek_ids))
+            entry_id = len(entries)
+            entries.append([label, kind, trek_ids])
+            words = key.split()
+            for start in range(len(words)):
+                records.append((" ".join(words[start:]), (entry_id, weight, int(start == 0))))
+        return cls(marisa_trie.RecordTrie(AUTOCOMPLETE_RECORD_FORMAT, records), entries, version, get_catalog_epoch())
+
+    def complete(self, prefix, limit=10):
+        """
+        Entries with a word starting with `prefix`, as dicts. Matches at the
+        start of a label come first, then the more popular entries.
+        """
+        prefix = normalize_label(prefix)
+        if not prefix:
+            return []
+        best = {}
+        for _, (entry_id, weight, at_start) in self.trie.items(prefix):
+            rank = (at_start, weight)
+            if rank > best.get(entry_id, (-1, 0)):
+                best[entry_id] = rank
+        top = heapq.nlargest(limit, best.items(), key=lambda item: (item[1], -item[0]))
+        return [
+            {'text': self.entries[entry_id][0], 'type': self.entries[entry_id][1], 'trek_ids': self.entries[entry_id][2][:5]}
+            for entry_id, _ in top
+        ]
+
+    @staticmethod
+    def directory():
+        return settings.RECOMMENDER_DATA_DIR
+
+    def save(self, directory=None):
+        """
+        Writes the trie under a new generation's name, then swaps in the
+        metadata that points at it, so readers always get a matching pair.
+        """
+        directory = directory or self.directory()
+        os.makedirs(directory, exist_ok=True)
+        self.generation = time.time_ns()
+        trie_name = AUTOCOMPLETE_TRIE_FILE.format(generation=self.generation)
+        trie_path = os.path.join(directory, trie_name)
+        self.trie.save(f"{trie_path}.tmp")
+        os.replace(f"{trie_path}.tmp", trie_path)
+
+        meta_path = os.path.join(directory, AUTOCOMPLETE_META_FILE)
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({
+                'version': self.version,
+                'epoch': self.epoch,
+                'generation': self.generation,
+                'trie': trie_name,
+                'entries': self.entries,
+            }, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        # Tries of older generations are no longer referenced; mapped copies stay readable
+        for name in os.listdir(directory):
+            if name.startswith('autocomplete.') and name.endswith('.marisa') and name != trie_name:
+                os.remove(os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory=None):
+        """Memory-maps the saved trie, or returns None if none was built."""
+        directory = directory or cls.directory()
+        try:
+            with open(os.path.join(directory, AUTOCOMPLETE_META_FILE)) as f:
+                meta = json.load(f)
+            trie = marisa_trie.RecordTrie(AUTOCOMPLETE_RECORD_FORMAT)
+            trie.mmap(os.path.join(directory, meta['trie']))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(trie, meta['entries'], meta['version'], meta.get('epoch'), meta.get('generation', 0))
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+def _meta_mtime():
+    try:
+        return os.stat(os.path.join(AutocompleteIndex.directory(), AUTOCOMPLETE_META_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+def get_autocomplete_index():
+    """
+    Process-wide index, reloaded whenever a newer one is saved (by another
+    worker or build_autocomplete, even at the same catalog version), and
+    rebuilt (then saved for the other workers) when the catalog changed
+    since it was built or it was built from another catalog epoch.
+    """
+    global _index, _index_mtime
+    epoch, version, _ = cached_catalog_state()
+    mtime = _meta_mtime()
+    index = _index
+    if index is not None and mtime == _index_mtime and index.epoch == epoch and index.version >= version:
+        return index
+    with _index_lock:
+        mtime = _meta_mtime()
+        if _index is None or mtime != _index_mtime:
+            _index = AutocompleteIndex.load() or _index
+            _index_mtime = mtime
+        index = _index
+        if index is None or index.epoch != epoch or index.version < version:
+            index = AutocompleteIndex.build(version)
+            index.save()
+            _index = index
+            _index_mtime = _meta_mtime()
+    return index
@@ -0,0 +1,133 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from .models import UserProfile, UserRecommendation
+from .recommend import (
+    TrekEmbeddingStore, get_trek_store, get_user_vector, interests_key,
+    blend_scores, top_k_rows,
+)
+from .catalog import get_catalog_epoch
+from .collaborative import InteractionFactors
+
+# Set in each worker by _init_worker
+_worker_state = {}
+
+
+def _init_worker(directory, epoch, cf_weight):
+    """
+    Worker start-up: memory-maps the trek store and loads the factor model
+    from disk. Workers never touch settings or the database; the parent
+    reads the catalog epoch for them.
+    """
+    _worker_state['store'] = TrekEmbeddingStore.load(directory)
+    _worker_state['factors'] = InteractionFactors.load(directory, epoch)
+    _worker_state['cf_weight'] = cf_weight
+
+def _score_chunk(user_ids, user_vectors, top_n):
+    """
+    Top-N trek ids for a chunk of users: one matrix product for the content
+    scores and one for the collaborative-filtering block.
+    """
+    store = _worker_state['store']
+    factors = _worker_state['factors']
+
+    content = user_vectors @ store.matrix.T
+    cf = factors.scores_block(user_ids, store.ids) if factors is not None else None
+    scores = blend_scores(content, cf, _worker_state['cf_weight'])
+
+    top = top_k_rows(scores, top_n)
+    results = []
+    for i, user_id in enumerate(user_ids):
+        columns = top[i][scores[i, top[i]] > 0]
+        results.append((int(user_id), store.ids[columns].tolist()))
+    return results
+
+
+def _profile_chunks(chunk_size, dim):
+    """(profiles, user ids, user vector matrix) for active profiles, chunk by chunk."""
+    profiles = UserProfile.objects.filter(is_active=True).only(
+        'id', 'interests', 'interest_vector', 'interests_key'
+    ).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(profiles.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        vectors = np.zeros((len(chunk), dim), dtype=np.float32)
+        for i, profile in enumerate(chunk):
+            if profile.interests:
+                vector = get_user_vector(profile, dim)
+                if vector is not None:
+                    vectors[i] = vector
+        yield chunk, np.array([profile.id for profile in chunk], dtype=np.int64), vectors
+
+def _save_results(chunk, results, version):
+    profiles_by_id = {profile.id: profile for profile in chunk}
+    UserRecommendation.objects.bulk_create(
+        [
+            UserRecommendation(
+                user_id=user_id,
+                trek_ids=trek_ids,
+                interests_key=interests_key(profiles_by_id[user_id].interests),
+                catalog_version=version,
+            )
+            for user_id, trek_ids in results
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['trek_ids', 'interests_key', 'catalog_version', 'computed_at'],
+    )
+
+def precompute_recommendations(top_n=6, chunk_size=1000, workers=None):
+    """
+    Scores every active profile against the whole catalog and stores the
+    top N trek ids per user in UserRecommendation. Chunks are scored in a
+    pool of worker processes that share the memory-mapped store files.
+    Returns the number of users processed.
+    """
+    # get_trek_store() leaves the up-to-date store on disk for the workers
+    store = get_trek_store()
+    directory = TrekEmbeddingStore.directory()
+    epoch = get_catalog_epoch()
+    cf_weight = settings.RECOMMENDER_CF_WEIGHT
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Forked children must not inherit open database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+            initargs=(directory, epoch, cf_weight),
+        )
+    else:
+        _init_worker(directory, epoch, cf_weight)
+        pool = None
+
+    processed = 0
+    pending = []
+    try:
+        for chunk, user_ids, vectors in _profile_chunks(chunk_size, store.matrix.shape[1]):
+            if pool is None:
+                _save_results(chunk, _score_chunk(user_ids, vectors, top_n), store.version)
+                processed += len(chunk)
+                continue
+            pending.append((chunk, pool.submit(_score_chunk, user_ids, vectors, top_n)))
+            # Keep a bounded number of chunks in flight
+            if len(pending) >= workers * 2:
+                chunk, future = pending.pop(0)
+                _save_results(chunk, future.result(), store.version)
+                processed += len(chunk)
+        for chunk, future in pending:
+            _save_results(chunk, future.result(), store.version)
+            processed += len(chunk)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return processed
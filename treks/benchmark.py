@@ -0,0 +1,183 @@
+import os
+import time
+import resource
+import tempfile
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from django.conf import settings
+from .recommend import (
+    TrekEmbeddingStore, embedding_dim, interest_vector, normalize_rows,
+    rank_trek_ids, top_k_indices, _interest_vectors,
+)
+from .catalog import get_catalog_epoch
+from .collaborative import InteractionFactors
+from .word_vectors import INTEREST_VOCABULARY
+from . import batch
+
+
+def synthetic_users(count, rng):
+    """
+    Interest lists of 1-6 words drawn from INTEREST_VOCABULARY with a Zipf-like
+    popularity, so a few interest sets repeat often as they do in the app.
+    """
+    popularity = 1 / np.arange(1, len(INTEREST_VOCABULARY) + 1)
+    popularity /= popularity.sum()
+    users = []
+    for _ in range(count):
+        size = int(rng.integers(1, 7))
+        words = rng.choice(len(INTEREST_VOCABULARY), size=size, replace=False, p=popularity)
+        users.append([INTEREST_VOCABULARY[i] for i in words])
+    return users
+
+def synthetic_catalog(count, rng, dim=None):
+    """
+    Store of `count` treks whose vectors mix a few interest-word vectors with
+    noise, so they sit where real trek texts do relative to user vectors.
+    Falls back to random unit vectors if no word has a vector.
+    """
+    dim = dim or embedding_dim()
+    topics = [vector for vector in (interest_vector([word]) for word in INTEREST_VOCABULARY) if vector is not None]
+    matrix = rng.standard_normal((count, dim)).astype(np.float32) * 0.5 / np.sqrt(dim)
+    if topics:
+        topics = np.asarray(topics, dtype=np.float32)
+        mix = rng.random((count, len(topics))) < 5 / len(topics)
+        matrix += mix.astype(np.float32) @ topics
+    return TrekEmbeddingStore(np.arange(1, count + 1, dtype=np.int64), normalize_rows(matrix))
+
+def synthetic_factors(store, users, rng, components=32):
+    """Random factor model over the synthetic users and catalog."""
+    return InteractionFactors(
+        np.arange(1, users + 1, dtype=np.int64),
+        rng.standard_normal((users, components)).astype(np.float32),
+        store.ids.copy(),
+        rng.standard_normal((len(store), components)).astype(np.float32),
+    )
+
+def cluster_catalog(store, rng):
+    """
+    IVF clusters for catalogs above RECOMMENDER_IVF_MIN_TREKS. MiniBatchKMeans
+    stands in for cluster_treks' KMeans to keep large runs short; it only
+    shifts recall, not the cost of a query.
+    """
+    n_clusters = max(1, round(np.sqrt(len(store))))
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, n_init=1, batch_size=4096, random_state=int(rng.integers(2**31))
+    ).fit(store.matrix)
+    centroids = np.ascontiguousarray(normalize_rows(kmeans.cluster_centers_), dtype=np.float32)
+    return store.with_clusters(centroids, kmeans.labels_.astype(np.int32))
+
+def latency_summary(samples):
+    """p50/p99/mean/max in milliseconds plus the single-thread throughput."""
+    samples = np.asarray(samples, dtype=np.float64)
+    return {
+        'count': len(samples),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'mean_ms': float(samples.mean() * 1000),
+        'max_ms': float(samples.max() * 1000),
+        'per_second': float(len(samples) / samples.sum()) if samples.sum() else None,
+    }
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (never decreases)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 if os.uname().sysname != 'Darwin' else peak / 1024 / 1024
+
+
+def benchmark_size(size, users, rng, top_n=6, chunk_size=1000, cold_runs=5):
+    """
+    Times the three recommendation paths on one synthetic catalog:
+
+    - cold: load the saved store and answer a first request with an empty
+      interest-vector cache (the start of a fresh worker);
+    - warm: rank_trek_ids() per user with the store and vectors in memory;
+    - batch: the precompute_recommendations scoring loop, chunk by chunk.
+    """
+    dim = embedding_dim()
+    interests = synthetic_users(users, rng)
+    build_started = time.perf_counter()
+    store = synthetic_catalog(size, rng, dim)
+    ivf = size >= settings.RECOMMENDER_IVF_MIN_TREKS
+    if ivf:
+        store = cluster_catalog(store, rng)
+    factors = synthetic_factors(store, users, rng)
+    build_seconds = time.perf_counter() - build_started
+
+    with tempfile.TemporaryDirectory() as directory:
+        store.save(directory)
+        factors.save(directory)
+
+        cold = []
+        for run in range(cold_runs):
+            _interest_vectors.clear()
+            started = time.perf_counter()
+            cold_store = TrekEmbeddingStore.load(directory)
+            cold_factors = InteractionFactors.load(directory)
+            rank_trek_ids(cold_store, interest_vector(interests[run % users]), run + 1, cold_factors, top_n)
+            cold.append(time.perf_counter() - started)
+
+        store = TrekEmbeddingStore.load(directory)
+        vectors = [interest_vector(user_interests) for user_interests in interests]
+        warm = []
+        recall_hits = recall_total = 0
+        for user_id, user_interests in enumerate(interests, start=1):
+            started = time.perf_counter()
+            trek_ids = rank_trek_ids(store, interest_vector(user_interests), user_id, factors, top_n)
+            warm.append(time.perf_counter() - started)
+
+            # Share of the exact content top-N that the clustered search finds
+            vector = vectors[user_id - 1]
+            if ivf and vector is not None:
+                exact = store.ids[top_k_indices(store.scores(vector), top_n)]
+                approx = rank_trek_ids(store, vector, top_n=top_n)
+                recall_hits += len(np.intersect1d(exact, approx))
+                recall_total += len(exact)
+
+        batch._init_worker(directory, get_catalog_epoch(), settings.RECOMMENDER_CF_WEIGHT)
+        user_ids = np.arange(1, users + 1, dtype=np.int64)
+        user_vectors = np.zeros((users, dim), dtype=np.float32)
+        for i, vector in enumerate(vectors):
+            if vector is not None:
+                user_vectors[i] = vector
+        chunks = []
+        batch_started = time.perf_counter()
+        for start in range(0, users, chunk_size):
+            started = time.perf_counter()
+            batch._score_chunk(user_ids[start:start + chunk_size], user_vectors[start:start + chunk_size], top_n)
+            chunks.append(time.perf_counter() - started)
+        batch_seconds = time.perf_counter() - batch_started
+        batch._worker_state.clear()
+
+    return {
+        'treks': size,
+        'users': users,
+        'dim': dim,
+        'ivf': ivf,
+        'ivf_recall': recall_hits / recall_total if recall_total else None,
+        'build_seconds': build_seconds,
+        'cold': latency_summary(cold),
+        'warm': latency_summary(warm),
+        'batch': {
+            'chunk_size': chunk_size,
+            'chunks': latency_summary(chunks),
+            'users_per_second': users / batch_seconds if batch_seconds else None,
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def run_benchmark(sizes, users=1000, top_n=6, chunk_size=1000, cold_runs=5, seed=0):
+    """Benchmarks each catalog size in increasing order (peak RSS is cumulative)."""
+    rng = np.random.default_rng(seed)
+    return {
+        'seed': seed,
+        'top_n': top_n,
+        'cf_weight': settings.RECOMMENDER_CF_WEIGHT,
+        'ivf_min_treks': settings.RECOMMENDER_IVF_MIN_TREKS,
+        'ivf_probes': settings.RECOMMENDER_IVF_PROBES,
+        'results': [
+            benchmark_size(size, users, rng, top_n, chunk_size, cold_runs)
+            for size in sorted(sizes)
+        ],
+    }
@@ -0,0 +1,70 @@
+import zlib
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from .models import Trek, TrekBlob
+from .serializers import TrekSerializer, TrekListSerializer
+
+_renderer = JSONRenderer()
+
+
+def render_json(data):
+    """JSON bytes exactly as the API's JSON renderer writes them."""
+    return _renderer.render(data)
+
+def render_trek_blob(trek):
+    """Unsaved TrekBlob with the trek's compressed list and detail JSON."""
+    return TrekBlob(
+        trek_id=trek.id,
+        list_json=zlib.compress(render_json(TrekListSerializer(trek).data)),
+        detail_json=zlib.compress(render_json(TrekSerializer(trek).data)),
+        rendered_at=timezone.now(),
+    )
+
+def store_trek_blobs(treks):
+    """Renders and upserts the blobs of `treks` (fully loaded Trek instances)."""
+    blobs = [render_trek_blob(trek) for trek in treks]
+    TrekBlob.objects.bulk_create(
+        blobs,
+        update_conflicts=True,
+        unique_fields=['trek'],
+        update_fields=['list_json', 'detail_json', 'rendered_at'],
+    )
+    return blobs
+
+def rebuild_trek_blobs(trek_ids=None, batch_size=500):
+    """Re-renders the blobs of the given treks, or of the whole catalog. Returns the count."""
+    treks = Trek.objects.order_by('id')
+    if trek_ids is not None:
+        treks = treks.filter(id__in=list(trek_ids))
+    count = 0
+    batch = []
+    for trek in treks.iterator(chunk_size=batch_size):
+        batch.append(trek)
+        if len(batch) == batch_size:
+            count += len(store_trek_blobs(batch))
+            batch = []
+    if batch:
+        count += len(store_trek_blobs(batch))
+    return count
+
+def trek_list_items(treks):
+    """
+    Decompressed list JSON of treks loaded with select_related('blob'),
+    rendering and storing any blob that is missing.
+    """
+    missing = [trek.id for trek in treks if not hasattr(trek, 'blob')]
+    rendered = {}
+    if missing:
+        rendered = {blob.trek_id: blob.list_json for blob in store_trek_blobs(Trek.objects.filter(id__in=missing))}
+    return [zlib.decompress(rendered[trek.id] if trek.id in rendered else trek.blob.list_json) for trek in treks]
+
+def trek_detail_json(trek_id):
+    """Decompressed detail JSON of one trek, or None if it has no blob."""
+    blob = TrekBlob.objects.filter(trek_id=trek_id).values_list('detail_json', flat=True).first()
+    return zlib.decompress(blob) if blob is not None else None
+
+def paginated_list_body(items, next_link):
+    """`{"next": ..., "results": [...]}` joined from pre-rendered items."""
+    next_json = render_json(next_link) if next_link is not None else b'null'
+    return b'{"next":' + next_json + b',"results":[' + b','.join(items) + b']}'
@@ -0,0 +1,238 @@
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from .models import Trek, TrekBlob, EmergencyContactPoint
+from .catalog import get_catalog_epoch, get_catalog_version, catalog_labels_generation
+from .blobs import store_trek_blobs
+
+OFFLINE_BUNDLE_FILE = "offline_bundle.{key}.sqlite"
+# Bumped when the bundle's tables change, so apps can tell layouts apart
+OFFLINE_BUNDLE_SCHEMA = 1
+
+OFFLINE_BUNDLE_TABLES = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE treks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    district TEXT,
+    region TEXT,
+    difficulty TEXT,
+    duration TEXT,
+    duration_min_days REAL,
+    duration_max_days REAL,
+    min_elevation_m INTEGER,
+    max_elevation_m INTEGER,
+    daily_cost_min_usd REAL,
+    daily_cost_max_usd REAL,
+    season_months INTEGER NOT NULL DEFAULT 0,
+    latitude REAL,
+    longitude REAL,
+    updated_at TEXT,
+    detail TEXT NOT NULL
+);
+CREATE TABLE route_points (
+    trek_id INTEGER NOT NULL REFERENCES treks (id),
+    position INTEGER NOT NULL,
+    name TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    PRIMARY KEY (trek_id, position)
+) WITHOUT ROWID;
+CREATE TABLE emergency_contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    email TEXT,
+    phone TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL
+);
+"""
+
+OFFLINE_BUNDLE_INDEXES = """
+CREATE INDEX treks_name ON treks (name COLLATE NOCASE);
+CREATE INDEX treks_region ON treks (region COLLATE NOCASE);
+CREATE INDEX treks_district ON treks (district COLLATE NOCASE);
+CREATE INDEX treks_difficulty ON treks (difficulty COLLATE NOCASE);
+CREATE INDEX treks_duration ON treks (duration_min_days, duration_max_days);
+CREATE INDEX treks_max_elevation ON treks (max_elevation_m);
+CREATE INDEX treks_daily_cost ON treks (daily_cost_min_usd);
+CREATE INDEX treks_season_months ON treks (season_months);
+CREATE INDEX route_points_location ON route_points (latitude, longitude);
+CREATE INDEX emergency_contacts_location ON emergency_contacts (latitude, longitude);
+CREATE INDEX emergency_contacts_type ON emergency_contacts (type, latitude, longitude);
+"""
+
+TREK_BUNDLE_COLUMNS = (
+    'id', 'name', 'district', 'region', 'difficulty', 'duration',
+    'duration_min_days', 'duration_max_days', 'min_elevation_m', 'max_elevation_m',
+    'daily_cost_min_usd', 'daily_cost_max_usd', 'season_months', 'latitude', 'longitude',
+)
+CONTACT_BUNDLE_COLUMNS = ('id', 'name', 'type', 'email', 'phone', 'latitude', 'longitude')
+
+_range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+_build_lock = threading.Lock()
+
+
+def bundle_directory():
+    return settings.RECOMMENDER_DATA_DIR
+
+def bundle_key():
+    """
+    Names the bundle of the current data: the catalog version, plus a digest
+    of the catalog epoch, the cluster labels generation and the emergency
+    contacts, which change without a catalog version bump.
+    """
+    version = get_catalog_version()
+    digest = hashlib.sha1(f"{get_catalog_epoch()}:{catalog_labels_generation()}".encode())
+    for row in EmergencyContactPoint.objects.order_by('id').values_list(*CONTACT_BUNDLE_COLUMNS):
+        digest.update(repr(row).encode())
+    return version, f"{version}-{digest.hexdigest()[:12]}"
+
+
+def _trek_rows(batch_size=500):
+    """(trek row, route point rows) per trek, with the detail JSON from the stored blobs."""
+    treks = Trek.objects.order_by('id').only(*TREK_BUNDLE_COLUMNS, 'itinerary_points', 'updated_at')
+    batch = []
+    for trek in treks.iterator(chunk_size=batch_size):
+        batch.append(trek)
+        if len(batch) == batch_size:
+            yield from _batch_rows(batch)
+            batch = []
+    if batch:
+        yield from _batch_rows(batch)
+
+def _batch_rows(treks):
+    blobs = dict(TrekBlob.objects.filter(trek_id__in=[trek.id for trek in treks]).values_list('trek_id', 'detail_json'))
+    missing = [trek.id for trek in treks if trek.id not in blobs]
+    if missing:
+        blobs.update({blob.trek_id: blob.detail_json for blob in store_trek_blobs(Trek.objects.filter(id__in=missing))})
+    for trek in treks:
+        row = [getattr(trek, column) for column in TREK_BUNDLE_COLUMNS]
+        row += [trek.updated_at.isoformat() if trek.updated_at else None, zlib.decompress(blobs[trek.id]).decode()]
+        points = [
+            (trek.id, position, point.get('name'), point['lat'], point['lng'])
+            for position, point in enumerate(trek.itinerary_points or [])
+            if isinstance(point, dict) and point.get('lat') is not None and point.get('lng') is not None
+        ]
+        yield row, points
+
+
+def build_offline_bundle(directory=None):
+    """
+    Writes the SQLite bundle of the current catalog, routes and emergency
+    contacts, with its indexes and query-planner statistics built, and
+    returns its path. The file is written under a temporary name and renamed
+    into place, read-only; bundles of older data are removed.
+    """
+    directory = directory or bundle_directory()
+    os.makedirs(directory, exist_ok=True)
+    version, key = bundle_key()
+    path = os.path.join(directory, OFFLINE_BUNDLE_FILE.format(key=key))
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    bundle = sqlite3.connect(tmp_path)
+    try:
+        bundle.executescript("PRAGMA page_size = 4096; PRAGMA journal_mode = OFF;" + OFFLINE_BUNDLE_TABLES)
+        placeholders = ", ".join("?" * (len(TREK_BUNDLE_COLUMNS) + 2))
+        count = 0
+        for row, points in _trek_rows():
+            bundle.execute(f"INSERT INTO treks VALUES ({placeholders})", row)
+            bundle.executemany("INSERT INTO route_points VALUES (?, ?, ?, ?, ?)", points)
+            count += 1
+        bundle.executemany(
+            "INSERT INTO emergency_contacts VALUES (?, ?, ?, ?, ?, ?, ?)",
+            EmergencyContactPoint.objects.order_by('id').values_list(*CONTACT_BUNDLE_COLUMNS),
+        )
+        bundle.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('schema', str(OFFLINE_BUNDLE_SCHEMA)),
+            ('catalog_version', str(version)),
+            ('catalog_epoch', get_catalog_epoch()),
+            ('bundle', key),
+            ('treks', str(count)),
+            ('built_at', timezone.now().isoformat()),
+        ])
+        # Indexes after the rows: one sorted build each instead of piecemeal inserts
+        bundle.executescript(OFFLINE_BUNDLE_INDEXES)
+        bundle.execute(f"PRAGMA user_version = {int(version)}")
+        bundle.commit()
+        bundle.execute("ANALYZE")
+        bundle.commit()
+        bundle.execute("VACUUM")
+    finally:
+        bundle.close()
+
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, path)
+    for name in os.listdir(directory):
+        if name.startswith('offline_bundle.') and name.endswith('.sqlite') and os.path.join(directory, name) != path:
+            os.remove(os.path.join(directory, name))
+    return path
+
+def get_offline_bundle():
+    """Path of the bundle of the current data, building it on first use."""
+    directory = bundle_directory()
+    _, key = bundle_key()
+    path = os.path.join(directory, OFFLINE_BUNDLE_FILE.format(key=key))
+    if not os.path.exists(path):
+        with _build_lock:
+            if not os.path.exists(path):
+                path = build_offline_bundle(directory)
+    return path
+
+
+def ranged_file_response(request, path, etag, content_type='application/octet-stream', filename=None):
+    """
+    Serves a file with single-range support for resumable downloads: 206
+    for a satisfiable `Range` (honouring `If-Range`), 416 for one past the
+    end, 304 for a matching `If-None-Match`, otherwise the whole file.
+    """
+    conditional = get_conditional_response(request, etag=etag)
+    if conditional is not None:
+        return conditional
+
+    size = os.path.getsize(path)
+    match = _range_pattern.match(request.META.get('HTTP_RANGE', '').strip())
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if match and (not if_range or if_range == etag) and (match.group(1) or match.group(2)):
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(match.group(2)), 0), size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+        handle = open(path, 'rb')
+        handle.seek(start)
+        response = StreamingHttpResponse(_read_range(handle, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _read_range(handle, length, block_size=64 * 1024):
+    with handle:
+        while length > 0:
+            block = handle.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Max
+from .models import TrekChange, CatalogState
+
+CATALOG_STATE_KEY = "trek-catalog-state"
+
+
+def get_catalog_epoch():
+    """
+    Hex id of this database's catalog (see CatalogState). Versions are only
+    comparable within one epoch.
+    """
+    return CatalogState.current().epoch.hex
+
+def get_catalog_version():
+    """
+    Current catalog version: the id of the newest TrekChange row, or 0 if the
+    catalog has never been written through the ORM.
+    """
+    return TrekChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+def get_catalog_state():
+    """(epoch, version, labels generation), read from the database."""
+    state = CatalogState.current()
+    return state.epoch.hex, get_catalog_version(), state.labels_generation
+
+def cached_catalog_state():
+    """
+    get_catalog_state() from the shared cache, so hot reads skip the
+    database. Writers publish new states; the timeout bounds how long a
+    missed or out-of-order publish (or a recreated database) can leave
+    workers behind. An evicted entry is read again from the database.
+    """
+    cache = caches['shared']
+    state = cache.get(CATALOG_STATE_KEY)
+    if state is None:
+        state = get_catalog_state()
+        cache.set(CATALOG_STATE_KEY, state, settings.CATALOG_VERSION_CACHE_TIMEOUT)
+    return state
+
+def cached_catalog_version():
+    """Catalog version from cached_catalog_state()."""
+    return cached_catalog_state()[1]
+
+def publish_catalog_state():
+    """Stores the current state in the shared cache once the write commits."""
+    transaction.on_commit(lambda: caches['shared'].set(
+        CATALOG_STATE_KEY, get_catalog_state(), settings.CATALOG_VERSION_CACHE_TIMEOUT
+    ))
+
+def catalog_labels_generation():
+    """
+    Generation of the derived columns (cluster labels) that are rewritten
+    without logging catalog changes, from the database.
+    """
+    return CatalogState.current().labels_generation
+
+def cached_catalog_labels_generation():
+    """catalog_labels_generation() from cached_catalog_state(); part of every response ETag and cache key."""
+    return cached_catalog_state()[2]
+
+def publish_catalog_labels():
+    """
+    Starts a new labels generation. It is counted in CatalogState, in the
+    same transaction as the label write, and published like a new version.
+    """
+    CatalogState.current()
+    CatalogState.objects.filter(pk=1).update(labels_generation=F('labels_generation') + 1)
+    publish_catalog_state()
+
+def record_trek_changes(trek_ids, action='saved'):
+    """
+    Appends one change per trek. Used by the Trek signals and by bulk
+    writers such as import_treks, which bypass signals.
+    """
+    TrekChange.objects.bulk_create([
+        TrekChange(trek_id=trek_id, action=action) for trek_id in trek_ids
+    ])
+    publish_catalog_state()
+
+def changes_since(version):
+    """
+    Collapses the change log after `version` to the last action per trek.
+    Returns (latest_version, saved_ids, deleted_ids).
+    """
+    latest = {}
+    newest = version
+    changes = TrekChange.objects.filter(id__gt=version).order_by('id').values_list('id', 'trek_id', 'action')
+    for change_id, trek_id, action in changes:
+        latest[trek_id] = action
+        newest = change_id
+    saved = sorted(trek_id for trek_id, action in latest.items() if action == 'saved')
+    deleted = sorted(trek_id for trek_id, action in latest.items() if action == 'deleted')
+    return newest, saved, deleted
@@ -0,0 +1,222 @@
+import os
+import json
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import TruncatedSVD
+from django.conf import settings
+from django.db.models import Max, Sum
+from .models import UserTrekInteraction
+from .catalog import get_catalog_epoch
+
+CF_USER_IDS_FILE = "cf_user_ids.npy"
+CF_USER_FACTORS_FILE = "cf_user_factors.npy"
+CF_ITEM_IDS_FILE = "cf_item_ids.npy"
+CF_ITEM_FACTORS_FILE = "cf_item_factors.npy"
+CF_META_FILE = "cf_model.json"
+
+
+def interaction_rows(user_ids=None):
+    """
+    (user_id, trek_id, weight) triples with the interaction weights of each
+    user/trek pair summed, optionally for some users only.
+    """
+    interactions = UserTrekInteraction.objects.all()
+    if user_ids is not None:
+        interactions = interactions.filter(user_id__in=user_ids)
+    rows = interactions.values('user_id', 'trek_id').annotate(weight=Sum('interaction_weight'))
+    return [(row['user_id'], row['trek_id'], row['weight']) for row in rows]
+
+
+class InteractionFactors:
+    """
+    Truncated SVD of the implicit-feedback user x trek matrix built from
+    UserTrekInteraction weights. `user_factors` are U*S and `item_factors`
+    are V, so a user's predicted affinities are item_factors @ user_factor.
+    Ids are kept sorted for searchsorted lookups.
+    """
+
+    def __init__(self, user_ids, user_factors, item_ids, item_factors, last_interaction_id=0):
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.item_ids = item_ids
+        self.item_factors = item_factors
+        self.last_interaction_id = last_interaction_id
+
+    def _weights_matrix(self, rows, user_ids):
+        """Sparse matrix of log-damped weights over `user_ids` x self.item_ids."""
+        users = np.array([row[0] for row in rows], dtype=np.int64)
+        items = np.array([row[1] for row in rows], dtype=np.int64)
+        weights = np.log1p(np.maximum(np.array([row[2] for row in rows], dtype=np.float32), 0))
+
+        item_pos = np.searchsorted(self.item_ids, items)
+        item_pos[item_pos == len(self.item_ids)] = 0
+        known = self.item_ids[item_pos] == items if len(self.item_ids) else np.zeros(len(items), dtype=bool)
+        user_pos = np.searchsorted(user_ids, users)
+        return csr_matrix(
+            (weights[known], (user_pos[known], item_pos[known])),
+            shape=(len(user_ids), len(self.item_ids)),
+        )
+
+    @classmethod
+    def build(cls, components=32):
+        """Factorises the full interaction matrix."""
+        last_id = UserTrekInteraction.objects.aggregate(last=Max('id'))['last'] or 0
+        rows = interaction_rows()
+        user_ids = np.unique(np.array([row[0] for row in rows], dtype=np.int64))
+        item_ids = np.unique(np.array([row[1] for row in rows], dtype=np.int64))
+        factors = cls(user_ids, None, item_ids, None, last_id)
+
+        components = min(components, len(user_ids) - 1, len(item_ids) - 1)
+        if components < 1:
+            factors.user_factors = np.zeros((len(user_ids), 0), dtype=np.float32)
+            factors.item_factors = np.zeros((len(item_ids), 0), dtype=np.float32)
+            return factors
+
+        svd = TruncatedSVD(n_components=components, random_state=0)
+        factors.user_factors = svd.fit_transform(factors._weights_matrix(rows, user_ids)).astype(np.float32)
+        factors.item_factors = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        return factors
+
+    def refresh(self):
+        """
+        Folds in only the users with interactions newer than the last build
+        or refresh: their rows are projected onto the existing item factors
+        (u = r @ V), which stay fixed until the next full build. Returns the
+        number of users updated.
+        """
+        new = UserTrekInteraction.objects.filter(id__gt=self.last_interaction_id)
+        last_id = new.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return 0
+        changed_users = np.unique(np.array(list(new.values_list('user_id', flat=True)), dtype=np.int64))
+        matrix = self._weights_matrix(interaction_rows(changed_users.tolist()), changed_users)
+        changed_factors = np.asarray(matrix @ self.item_factors, dtype=np.float32)
+
+        keep = ~np.isin(self.user_ids, changed_users)
+        user_ids = np.concatenate([self.user_ids[keep], changed_users])
+        user_factors = np.concatenate([self.user_factors[keep], changed_factors])
+        order = np.argsort(user_ids, kind='stable')
+        self.user_ids = user_ids[order]
+        self.user_factors = np.ascontiguousarray(user_factors[order])
+        self.last_interaction_id = last_id
+        return len(changed_users)
+
+    def scores_for(self, user_id, trek_ids):
+        """
+        Affinities of one user for `trek_ids`, scaled into [-1, 1]. Treks
+        without interactions score 0. Returns None for users the model has
+        not seen.
+        """
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos == len(self.user_ids) or self.user_ids[pos] != user_id or not len(self.item_ids):
+            return None
+        item_scores = self.item_factors @ self.user_factors[pos]
+        peak = np.abs(item_scores).max() if len(item_scores) else 0
+        if peak == 0:
+            return None
+
+        item_pos = np.searchsorted(self.item_ids, trek_ids)
+        item_pos[item_pos == len(self.item_ids)] = 0
+        known = self.item_ids[item_pos] == trek_ids
+        return np.where(known, item_scores[item_pos] / peak, 0).astype(np.float32)
+
+    def scores_block(self, user_ids, trek_ids):
+        """
+        scores_for() for many users at once: one factor product for the
+        block. Rows of users the model has not seen are all zero.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        trek_ids = np.asarray(trek_ids, dtype=np.int64)
+        block = np.zeros((len(user_ids), len(trek_ids)), dtype=np.float32)
+        if not len(self.user_ids) or not len(self.item_ids):
+            return block
+
+        user_pos = np.searchsorted(self.user_ids, user_ids)
+        user_pos[user_pos == len(self.user_ids)] = 0
+        known_users = self.user_ids[user_pos] == user_ids
+        item_pos = np.searchsorted(self.item_ids, trek_ids)
+        item_pos[item_pos == len(self.item_ids)] = 0
+        known_items = self.item_ids[item_pos] == trek_ids
+
+        item_scores = self.user_factors[user_pos[known_users]] @ self.item_factors.T
+        peak = np.abs(item_scores).max(axis=1, keepdims=True)
+        peak[peak == 0] = 1
+        rows = np.where(known_items, (item_scores / peak)[:, item_pos], 0)
+        block[known_users] = rows
+        return block
+
+    @staticmethod
+    def directory():
+        return settings.RECOMMENDER_DATA_DIR
+
+    def save(self, directory=None):
+        directory = directory or self.directory()
+        os.makedirs(directory, exist_ok=True)
+        for filename, array in (
+            (CF_USER_IDS_FILE, self.user_ids),
+            (CF_USER_FACTORS_FILE, self.user_factors),
+            (CF_ITEM_IDS_FILE, self.item_ids),
+            (CF_ITEM_FACTORS_FILE, self.item_factors),
+        ):
+            path = os.path.join(directory, filename)
+            with open(f"{path}.tmp", 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(f"{path}.tmp", path)
+
+        meta_path = os.path.join(directory, CF_META_FILE)
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({
+                'last_interaction_id': self.last_interaction_id,
+                'epoch': get_catalog_epoch(),
+                'users': len(self.user_ids),
+                'items': len(self.item_ids),
+            }, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory=None, epoch=None):
+        """
+        Loads saved factors, or returns None if none were built or they were
+        built from another database (interaction ids restart in a new one).
+        Pass the catalog `epoch` to compare against where the database must
+        not be queried.
+        """
+        directory = directory or cls.directory()
+        meta_path = os.path.join(directory, CF_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('epoch') != (epoch or get_catalog_epoch()):
+            return None
+        arrays = [
+            np.load(os.path.join(directory, filename))
+            for filename in (CF_USER_IDS_FILE, CF_USER_FACTORS_FILE, CF_ITEM_IDS_FILE, CF_ITEM_FACTORS_FILE)
+        ]
+        if len(arrays[0]) != meta['users'] or len(arrays[2]) != meta['items']:
+            return None
+        return cls(*arrays, meta['last_interaction_id'])
+
+
+_factors = None
+_factors_mtime = None
+_factors_lock = threading.Lock()
+
+def get_interaction_factors():
+    """
+    Process-wide factors, reloaded whenever build_interaction_factors has
+    written a newer model. Returns None if no model was built.
+    """
+    global _factors, _factors_mtime
+    try:
+        mtime = os.stat(os.path.join(InteractionFactors.directory(), CF_META_FILE)).st_mtime_ns
+    except OSError:
+        return None
+    if mtime != _factors_mtime:
+        with _factors_lock:
+            if mtime != _factors_mtime:
+                _factors = InteractionFactors.load()
+                _factors_mtime = mtime
+    return _factors
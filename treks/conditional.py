@@ -0,0 +1,88 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+from .models import TrekChange
+from .catalog import cached_catalog_labels_generation, get_catalog_epoch
+from .autocomplete import get_autocomplete_index
+from .similar import similar_treks_version
+
+
+def _latest_change(request, trek_id=None):
+    """
+    (version, time) of the newest TrekChange, or of the newest change to one
+    trek. Remembered on the request, as ETag and Last-Modified both need it.
+    """
+    key = f"_trek_change_{trek_id}"
+    if not hasattr(request, key):
+        changes = TrekChange.objects.order_by('-id').values_list('id', 'created_at')
+        if trek_id is not None:
+            changes = changes.filter(trek_id=trek_id)
+        setattr(request, key, changes.first() or (0, None))
+    return getattr(request, key)
+
+def _catalog_epoch(request):
+    """Short form of the catalog epoch, remembered on the request."""
+    if not hasattr(request, '_catalog_epoch'):
+        request._catalog_epoch = get_catalog_epoch()[:8]
+    return request._catalog_epoch
+
+def request_variant(request):
+    """
+    Digest of what else shapes the response body: the URL (its query string
+    holds filters, sparse fieldsets and cursors; the host appears in `next`
+    links), the negotiated format, the cluster labels generation and, for
+    open_now, the month it resolves to.
+    """
+    parts = [
+        request.build_absolute_uri(), request.META.get('HTTP_ACCEPT', ''), str(cached_catalog_labels_generation()),
+    ]
+    if 'open_now' in request.GET:
+        parts.append(str(timezone.now().month))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+def _trek_id(kwargs):
+    try:
+        return int(kwargs.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def catalog_etag(request, *args, **kwargs):
+    return f"c{_catalog_epoch(request)}.{_latest_change(request)[0]}-{request_variant(request)}"
+
+def catalog_last_modified(request, *args, **kwargs):
+    if 'open_now' in request.GET:
+        # Changes with the month as well; only the ETag captures that
+        return None
+    return _latest_change(request)[1]
+
+def trek_etag(request, *args, **kwargs):
+    """Row-level: changes only when this trek is saved (or deleted)."""
+    return f"t{_catalog_epoch(request)}.{_latest_change(request, _trek_id(kwargs))[0]}-{request_variant(request)}"
+
+def trek_last_modified(request, *args, **kwargs):
+    return _latest_change(request, _trek_id(kwargs))[1]
+
+def similar_etag(request, *args, **kwargs):
+    """Also moves when build_similar_treks or a refresh fills the neighbour table."""
+    version = _latest_change(request)[0]
+    return f"s{_catalog_epoch(request)}.{version}.{similar_treks_version()}-{request_variant(request)}"
+
+def autocomplete_etag(request, *args, **kwargs):
+    """The index generation: changes with catalog writes and with rebuilds at the same version."""
+    return f"a{get_autocomplete_index().generation}-{request_variant(request)}"
+
+def autocomplete_last_modified(request, *args, **kwargs):
+    generation = get_autocomplete_index().generation
+    return datetime.fromtimestamp(generation / 1e9, tz=dt_timezone.utc) if generation else None
+
+
+# Answer If-None-Match / If-Modified-Since with 304 before the view queries
+# or serialises anything. Wrap with method_decorator on class-based views.
+catalog_condition = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+trek_condition = condition(etag_func=trek_etag, last_modified_func=trek_last_modified)
+# The table fills after the catalog changes, so no Last-Modified from TrekChange
+similar_condition = condition(etag_func=similar_etag)
+autocomplete_condition = condition(etag_func=autocomplete_etag, last_modified_func=autocomplete_last_modified)
@@ -0,0 +1,72 @@
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .parsing import parse_month
+
+NUMERIC_FILTERS = ('min_days', 'max_days', 'max_elevation', 'max_daily_cost')
+
+
+def trek_filters_from_params(params):
+    """
+    Trek attribute filters from request query parameters, in the form
+    TrekEmbeddingStore.filter_mask() takes. `difficulty` accepts a
+    comma-separated list; `month` a number or month name. `open_now=true`
+    stands for the current month when no month is given.
+    """
+    filters = {}
+    if params.get('difficulty'):
+        filters['difficulty'] = [level for level in params['difficulty'].split(',') if level.strip()]
+    for name in ('region', 'district'):
+        if params.get(name):
+            filters[name] = params[name]
+    if params.get('month'):
+        month = parse_month(params['month'])
+        if month is None:
+            raise ValidationError({'month': 'Must be a month number (1-12) or name.'})
+        filters['month'] = month
+    elif params.get('open_now', '').lower() in ('true', '1', 'yes'):
+        filters['month'] = timezone.localdate().month
+    for name in NUMERIC_FILTERS:
+        if params.get(name):
+            try:
+                filters[name] = float(params[name])
+            except ValueError:
+                raise ValidationError({name: 'Must be a number.'})
+    return filters
+
+def limit_from_params(params, default, maximum):
+    """The `limit` query parameter, clamped to 1..maximum."""
+    try:
+        limit = int(params.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValidationError({'limit': 'Must be an integer.'})
+    return max(1, min(limit, maximum))
+
+def filter_trek_queryset(queryset, filters):
+    """
+    Applies trek_filters_from_params() filters as SQL. Range and month
+    filters use the columns parsed from the free-text fields; the month is
+    one bitwise AND against Trek.season_months.
+    """
+    if filters.get('difficulty'):
+        levels = Q()
+        for level in filters['difficulty']:
+            levels |= Q(difficulty__iexact=level.strip())
+        queryset = queryset.filter(levels)
+    if filters.get('region'):
+        queryset = queryset.filter(region__icontains=filters['region'].strip())
+    if filters.get('district'):
+        queryset = queryset.filter(district__icontains=filters['district'].strip())
+    if filters.get('max_days') is not None:
+        queryset = queryset.filter(duration_min_days__lte=filters['max_days'])
+    if filters.get('min_days') is not None:
+        queryset = queryset.filter(duration_max_days__gte=filters['min_days'])
+    if filters.get('max_elevation') is not None:
+        queryset = queryset.filter(max_elevation_m__lte=filters['max_elevation'])
+    if filters.get('max_daily_cost') is not None:
+        queryset = queryset.filter(daily_cost_min_usd__lte=filters['max_daily_cost'])
+    if filters.get('month'):
+        queryset = queryset.alias(
+            in_season=F('season_months').bitand(1 << (filters['month'] - 1))
+        ).filter(in_season__gt=0)
+    return queryset
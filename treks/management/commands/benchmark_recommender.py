@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+from treks.benchmark import run_benchmark
+
+class Command(BaseCommand):
+    help = 'Benchmark the recommender on synthetic catalogs and print the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000, 100000],
+            help='Catalog sizes to benchmark'
+        )
+        parser.add_argument('--users', type=int, default=1000, help='Synthetic users per catalog')
+        parser.add_argument('--top-n', type=int, default=6, help='Treks recommended per user')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per batch chunk')
+        parser.add_argument('--cold-runs', type=int, default=5, help='Cold-start samples per catalog')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--output', default=None, help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        report = run_benchmark(
+            options['sizes'],
+            users=options['users'],
+            top_n=options['top_n'],
+            chunk_size=options['chunk_size'],
+            cold_runs=options['cold_runs'],
+            seed=options['seed'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
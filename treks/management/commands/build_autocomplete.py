@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from treks.autocomplete import AutocompleteIndex
+
+class Command(BaseCommand):
+    help = 'Build the autocomplete trie of trek names, villages and attractions'
+
+    def handle(self, *args, **options):
+        index = AutocompleteIndex.build()
+        index.save()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Indexed {len(index.entries)} label(s) under {len(index.trie)} key(s).")
+        )
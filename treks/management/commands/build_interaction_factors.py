@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from treks.collaborative import InteractionFactors
+
+class Command(BaseCommand):
+    help = 'Factorise UserTrekInteraction weights for collaborative-filtering recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Refactorise all interactions instead of folding in only the newest ones'
+        )
+        parser.add_argument(
+            '--components',
+            type=int,
+            default=32,
+            help='Number of latent factors for a full build'
+        )
+
+    def handle(self, *args, **options):
+        factors = None if options['full'] else InteractionFactors.load()
+
+        if factors is None:
+            factors = InteractionFactors.build(options['components'])
+            factors.save()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Factorised {len(factors.user_ids)} user(s) x {len(factors.item_ids)} trek(s) "
+                    f"into {factors.item_factors.shape[1]} component(s)."
+                )
+            )
+            return
+
+        updated = factors.refresh()
+        factors.save()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Folded in {updated} user(s) with new interactions.")
+        )
@@ -0,0 +1,12 @@
+import os
+from django.core.management.base import BaseCommand
+from treks.bundle import build_offline_bundle
+
+class Command(BaseCommand):
+    help = 'Build the offline SQLite bundle of treks, routes and emergency contacts'
+
+    def handle(self, *args, **options):
+        path = build_offline_bundle()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB).")
+        )
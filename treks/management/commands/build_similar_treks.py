@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from treks.recommend import get_trek_store
+from treks.similar import rebuild_similar_treks, ensure_similar_treks
+
+class Command(BaseCommand):
+    help = 'Precompute the similar-treks neighbour table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every neighbour list instead of only those affected by catalog changes'
+        )
+
+    def handle(self, *args, **options):
+        store = get_trek_store()
+        if options['full']:
+            count = rebuild_similar_treks(store)
+            self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt similar treks for {count} trek(s)."))
+            return
+
+        ensure_similar_treks(store)
+        self.stdout.write(self.style.SUCCESS(f"✅ Similar treks are up to date with catalog version {store.version}."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from treks.blobs import rebuild_trek_blobs
+
+class Command(BaseCommand):
+    help = 'Re-render the stored list and detail JSON of every trek'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Treks rendered and written per batch'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_trek_blobs(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Rendered JSON for {count} trek(s)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from treks.recommend import TrekEmbeddingStore
+
+class Command(BaseCommand):
+    help = 'Embed every trek and save the embedding matrix used by recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Directory to write the store to (defaults to RECOMMENDER_DATA_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        store = TrekEmbeddingStore.build()
+        store.save(options['output'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Saved embeddings for {len(store)} trek(s) ({store.matrix.shape[1]} dims)."
+            )
+        )
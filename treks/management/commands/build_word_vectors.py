@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from treks.models import Trek, UserProfile
+from treks.recommend import get_nlp, build_trek_text
+from treks.word_vectors import WordVectorTable, INTEREST_VOCABULARY
+
+class Command(BaseCommand):
+    help = 'Write the pruned float16 word-vector table used to embed text at request time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--general-words',
+            type=int,
+            default=50000,
+            help='Number of most frequent general words to keep besides the trek and interest vocabulary'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Directory to write the table to (defaults to RECOMMENDER_DATA_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        nlp = get_nlp()
+
+        texts = [build_trek_text(trek) for trek in Trek.objects.all()]
+        texts.extend(INTEREST_VOCABULARY)
+        for interests in UserProfile.objects.values_list('interests', flat=True):
+            texts.extend(str(interest) for interest in interests or [])
+
+        table = WordVectorTable.build(nlp, texts, options['general_words'])
+        table.save(options['output'])
+
+        full_bytes = nlp.vocab.vectors.data.nbytes
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Kept {len(table)} word(s) in {len(table.vectors)} row(s): "
+                f"{table.vectors.nbytes / 1e6:.1f} MB vs {full_bytes / 1e6:.1f} MB in {nlp.meta.get('name', 'the model')}."
+            )
+        )
+        self.stdout.write("Run build_trek_embeddings to re-embed the catalog with the new table.")
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+from sklearn.cluster import KMeans
+from django.core.management.base import BaseCommand
+from treks.models import Trek
+from treks.recommend import get_trek_store, normalize_rows, sync_cluster_labels
+from treks.catalog import publish_catalog_labels
+from treks.blobs import rebuild_trek_blobs
+
+class Command(BaseCommand):
+    help = 'Cluster the trek embedding matrix with KMeans and write Trek.cluster_label'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clusters',
+            type=int,
+            default=None,
+            help='Number of clusters (defaults to about the square root of the catalog size)'
+        )
+        parser.add_argument(
+            '--assign',
+            action='store_true',
+            help='Place treks saved since the last run in their nearest existing cluster instead of re-clustering'
+        )
+
+    def handle(self, *args, **options):
+        store = get_trek_store()
+        if not len(store):
+            self.stdout.write(self.style.WARNING("⚠️  No treks to cluster."))
+            return
+
+        if options['assign']:
+            if store.centroids is None:
+                self.stdout.write(self.style.WARNING("⚠️  No clusters yet; run cluster_treks without --assign first."))
+                return
+            relabelled = sync_cluster_labels(store)
+            if relabelled:
+                rebuild_trek_blobs(relabelled)
+                publish_catalog_labels()
+            self.stdout.write(self.style.SUCCESS(f"✅ Relabelled {len(relabelled)} trek(s)."))
+            return
+
+        n_clusters = options['clusters'] or max(1, round(math.sqrt(len(store))))
+        n_clusters = min(n_clusters, len(store))
+        kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=0).fit(np.asarray(store.matrix))
+        centroids = np.ascontiguousarray(normalize_rows(kmeans.cluster_centers_), dtype=np.float32)
+        labels = kmeans.labels_.astype(np.int32)
+
+        # bulk_update sends no signals: labels are derived data, not a catalog edit
+        Trek.objects.bulk_update(
+            [Trek(id=int(trek_id), cluster_label=int(label)) for trek_id, label in zip(store.ids, labels)],
+            ['cluster_label'],
+            batch_size=1000,
+        )
+        rebuild_trek_blobs()
+        # Save first: workers look for a new generation once the labels generation moves
+        store.with_clusters(centroids, labels).save()
+        publish_catalog_labels()
+
+        sizes = np.bincount(labels, minlength=n_clusters)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Clustered {len(store)} trek(s) into {n_clusters} cluster(s) "
+                f"(sizes {sizes.min()}-{sizes.max()})."
+            )
+        )
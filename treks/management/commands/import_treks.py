@@ -1,6 +1,8 @@
 import json
 from django.core.management.base import BaseCommand
 from treks.models import Trek
+from treks.catalog import record_trek_changes
+from treks.blobs import store_trek_blobs
 
 class Command(BaseCommand):
     help = 'Import trek data from JSON file'
@@ -32,7 +34,12 @@ class Command(BaseCommand):
                 photos=item.get("photos"),
                 
             )
+            # bulk_create bypasses Trek.save()
+            trek.set_parsed_fields()
             treks.append(trek)
 
         Trek.objects.bulk_create(treks)
+        # bulk_create skips post_save, so bump the catalog version by hand
+        record_trek_changes([trek.id for trek in treks if trek.id is not None])
+        store_trek_blobs([trek for trek in treks if trek.id is not None])
         self.stdout.write(self.style.SUCCESS(f"✅ Inserted {len(treks)} trek(s) into the database."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from treks.batch import precompute_recommendations
+
+class Command(BaseCommand):
+    help = 'Precompute trek recommendations for every active user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=6, help='Treks stored per user')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users scored per matrix product')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes (defaults to the number of CPUs)'
+        )
+
+    def handle(self, *args, **options):
+        count = precompute_recommendations(
+            top_n=options['top_n'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Stored recommendations for {count} user(s)."))
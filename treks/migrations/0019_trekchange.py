@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0018_passwordresetotp_is_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrekChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trek_id', models.BigIntegerField(db_index=True)),
+                ('action', models.CharField(choices=[('saved', 'Saved'), ('deleted', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0019_trekchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='interest_vector',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='interests_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0020_userprofile_interest_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trek',
+            name='cluster_label',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
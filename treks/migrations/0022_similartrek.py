@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0021_alter_trek_cluster_label'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarTrek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('similar', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='treks.trek')),
+                ('trek', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='treks.trek')),
+            ],
+            options={
+                'ordering': ['trek', 'rank'],
+                'unique_together': {('trek', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0022_similartrek'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trek_ids', models.JSONField(default=list)),
+                ('interests_key', models.CharField(blank=True, default='', max_length=40)),
+                ('catalog_version', models.BigIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation', to='treks.userprofile')),
+            ],
+        ),
+    ]
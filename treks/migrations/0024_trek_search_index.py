@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Plain-text value of a JSON column: its string leaves joined by spaces
+def _json_text(column):
+    return f"(SELECT group_concat(value, ' ') FROM json_tree({column}) WHERE type = 'text')"
+
+FTS_COLUMNS = [
+    'name', 'district', 'region', 'description', 'historical_significance',
+    'itinerary', 'nearby_attractions', 'tags',
+]
+JSON_COLUMNS = {'itinerary', 'nearby_attractions', 'tags'}
+
+
+def _values(prefix):
+    return ", ".join(
+        _json_text(f"{prefix}{column}") if column in JSON_COLUMNS else f"{prefix}{column}"
+        for column in FTS_COLUMNS
+    )
+
+
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE treks_trek_fts USING fts5({', '.join(FTS_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')",
+    f"INSERT INTO treks_trek_fts (rowid, {', '.join(FTS_COLUMNS)}) SELECT id, {_values('')} FROM treks_trek",
+    f"""CREATE TRIGGER treks_trek_fts_insert AFTER INSERT ON treks_trek BEGIN
+        INSERT INTO treks_trek_fts (rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {_values('new.')});
+    END""",
+    f"""CREATE TRIGGER treks_trek_fts_update AFTER UPDATE ON treks_trek BEGIN
+        DELETE FROM treks_trek_fts WHERE rowid = old.id;
+        INSERT INTO treks_trek_fts (rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {_values('new.')});
+    END""",
+    """CREATE TRIGGER treks_trek_fts_delete AFTER DELETE ON treks_trek BEGIN
+        DELETE FROM treks_trek_fts WHERE rowid = old.id;
+    END""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS treks_trek_fts_insert",
+    "DROP TRIGGER IF EXISTS treks_trek_fts_update",
+    "DROP TRIGGER IF EXISTS treks_trek_fts_delete",
+    "DROP TABLE IF EXISTS treks_trek_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases fall back to a LIKE search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0023_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
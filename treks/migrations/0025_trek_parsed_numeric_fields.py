@@ -0,0 +1,61 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+def fill_parsed_fields(apps, schema_editor):
+    from treks.parsing import parse_duration, parse_elevation_range, parse_daily_cost
+
+    Trek = apps.get_model('treks', 'Trek')
+    treks = list(Trek.objects.only('id', 'duration', 'elevation_profile', 'cost_breakdown'))
+    for trek in treks:
+        trek.duration_min_days, trek.duration_max_days = parse_duration(trek.duration)
+        trek.min_elevation_m, trek.max_elevation_m = parse_elevation_range(trek.elevation_profile)
+        trek.daily_cost_min_usd, trek.daily_cost_max_usd = parse_daily_cost(trek.cost_breakdown)
+    Trek.objects.bulk_update(
+        treks,
+        ['duration_min_days', 'duration_max_days', 'min_elevation_m', 'max_elevation_m',
+         'daily_cost_min_usd', 'daily_cost_max_usd'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0024_trek_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trek',
+            name='daily_cost_max_usd',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trek',
+            name='daily_cost_min_usd',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trek',
+            name='duration_max_days',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trek',
+            name='duration_min_days',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trek',
+            name='max_elevation_m',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trek',
+            name='min_elevation_m',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_parsed_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+def fill_season_months(apps, schema_editor):
+    from treks.parsing import season_bitmask
+
+    Trek = apps.get_model('treks', 'Trek')
+    treks = list(Trek.objects.only('id', 'best_seasons'))
+    for trek in treks:
+        trek.season_months = season_bitmask(trek.best_seasons)
+    Trek.objects.bulk_update(treks, ['season_months'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0025_trek_parsed_numeric_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trek',
+            name='season_months',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_season_months, migrations.RunPython.noop),
+    ]
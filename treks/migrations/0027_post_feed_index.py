@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0026_trek_season_months'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='treks_post_created_93e413_idx'),
+        ),
+    ]
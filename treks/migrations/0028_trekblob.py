@@ -0,0 +1,24 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0027_post_feed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrekBlob',
+            fields=[
+                ('trek', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blob', serialize=False, to='treks.trek')),
+                ('list_json', models.BinaryField()),
+                ('detail_json', models.BinaryField()),
+                ('rendered_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0028_trekblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trek',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-18 16:02
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_catalog_state(apps, schema_editor):
+    CatalogState = apps.get_model('treks', 'CatalogState')
+    CatalogState.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0029_trek_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.UUIDField(default=uuid.uuid4, editable=False)),
+            ],
+        ),
+        migrations.RunPython(create_catalog_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0030_catalogstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogstate',
+            name='labels_generation',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treks', '0031_catalogstate_labels_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogstate',
+            name='similar_treks_version',
+            field=models.BigIntegerField(default=-1),
+        ),
+    ]
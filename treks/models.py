@@ -8,6 +8,7 @@ import base64
 from io import BytesIO
 import requests
 import math
+import uuid
 
 
 class UserProfile(models.Model):
@@ -23,12 +24,22 @@ class UserProfile(models.Model):
     photo_url = models.URLField(blank=True, null=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES,default='user')
     interests = models.JSONField(default=list, blank=True) 
+    # Unit float32 embedding of `interests`, refreshed on save when they change
+    interest_vector = models.BinaryField(null=True, blank=True, editable=False)
+    interests_key = models.CharField(max_length=40, blank=True, default='', editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
 
     def is_admin(self):
         return self.role in ['admin', 'superadmin']
 
+    def save(self, *args, **kwargs):
+        from .recommend import update_interest_vector
+
+        if update_interest_vector(self) and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'interest_vector', 'interests_key'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.display_name or self.user.username
     
@@ -56,13 +67,131 @@ class Trek(models.Model):
     transit_card_cost = models.IntegerField(null=True, blank=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
-    cluster_label = models.IntegerField(null=True, blank=True)
+    cluster_label = models.IntegerField(null=True, blank=True, db_index=True)
     tags = models.JSONField(null=True, blank=True)
+    # Parsed from duration, elevation_profile, cost_breakdown and best_seasons on save, for filters
+    duration_min_days = models.FloatField(null=True, blank=True, db_index=True, editable=False)
+    duration_max_days = models.FloatField(null=True, blank=True, db_index=True, editable=False)
+    min_elevation_m = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    max_elevation_m = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    daily_cost_min_usd = models.FloatField(null=True, blank=True, db_index=True, editable=False)
+    daily_cost_max_usd = models.FloatField(null=True, blank=True, db_index=True, editable=False)
+    # best_seasons as a 12-bit month mask, bit 0 for January
+    season_months = models.IntegerField(default=0, db_index=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    PARSED_FIELDS = (
+        'duration_min_days', 'duration_max_days', 'min_elevation_m', 'max_elevation_m',
+        'daily_cost_min_usd', 'daily_cost_max_usd', 'season_months',
+    )
+
+    def set_parsed_fields(self):
+        """Fills the numeric columns from the free-text fields."""
+        from .parsing import parse_duration, parse_elevation_range, parse_daily_cost, season_bitmask
+
+        self.duration_min_days, self.duration_max_days = parse_duration(self.duration)
+        self.min_elevation_m, self.max_elevation_m = parse_elevation_range(self.elevation_profile)
+        self.daily_cost_min_usd, self.daily_cost_max_usd = parse_daily_cost(self.cost_breakdown)
+        self.season_months = season_bitmask(self.best_seasons)
+
+    def save(self, *args, **kwargs):
+        self.set_parsed_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | set(self.PARSED_FIELDS) | {'updated_at'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
+class TrekChange(models.Model):
+    """
+    Append-only log of catalog writes. The id of the latest row is the
+    catalog version that caches compare against.
+    """
+    ACTIONS = (
+        ('saved', 'Saved'),
+        ('deleted', 'Deleted'),
+    )
+    trek_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Trek {self.trek_id} {self.action} (v{self.id})"
+
+
+class CatalogState(models.Model):
+    """
+    Single row (pk 1) of catalog-wide state. `epoch` is generated when the
+    database is created: catalog versions restart from zero in a new
+    database, so everything saved against a version also records the epoch
+    and is stale under any other. `labels_generation` counts rewrites of
+    the cluster labels, which change responses without a catalog version.
+    `similar_treks_version` is the catalog version the SimilarTrek table was
+    last brought up to (-1 until it is built).
+    """
+    epoch = models.UUIDField(default=uuid.uuid4, editable=False)
+    labels_generation = models.PositiveBigIntegerField(default=0)
+    similar_treks_version = models.BigIntegerField(default=-1)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.get_or_create(pk=1)[0]
+
+    def __str__(self):
+        return f"Catalog epoch {self.epoch}"
+
+
+class SimilarTrek(models.Model):
+    """
+    Precomputed nearest neighbours of a trek by embedding similarity.
+    `similar` has no DB constraint so rows pointing at a deleted trek survive
+    until the next refresh, which uses them to find the lists to rebuild.
+    """
+    trek = models.ForeignKey(Trek, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Trek, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['trek', 'rank']
+        unique_together = ('trek', 'rank')
+
+    def __str__(self):
+        return f"{self.trek_id} -> {self.similar_id} (#{self.rank})"
+
+
+class TrekBlob(models.Model):
+    """
+    A trek's default list and detail JSON, rendered once per write and
+    stored zlib-compressed, so responses are assembled from bytes.
+    """
+    trek = models.OneToOneField(Trek, on_delete=models.CASCADE, primary_key=True, related_name='blob')
+    list_json = models.BinaryField()
+    detail_json = models.BinaryField()
+    rendered_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Rendered JSON of trek {self.trek_id}"
+
+
+class UserRecommendation(models.Model):
+    """
+    Top treks precomputed for a user by precompute_recommendations.
+    `interests_key` records the interests they were computed for, so a
+    profile edited since the last run falls back to live scoring.
+    """
+    user = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='recommendation')
+    trek_ids = models.JSONField(default=list)
+    interests_key = models.CharField(max_length=40, blank=True, default='')
+    catalog_version = models.BigIntegerField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Recommendations for {self.user} (v{self.catalog_version})"
+
+
 class TimsApplication(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -166,6 +295,7 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['trek', '-created_at']),
             models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['-created_at', '-id']),
         ]
 
     def __str__(self):
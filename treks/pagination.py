@@ -0,0 +1,119 @@
+import json
+import base64
+import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ordering (for example created_at plus id).
+    A page is the rows strictly after the last row of the previous page, so
+    with an index on the ordering every page is a bounded index range scan,
+    however deep the client scrolls. The cursor is an opaque encoding of
+    that last row's ordering values; pages only go forward. The default
+    ordering is newest first, for feeds.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        values = []
+        for name in self.ordering:
+            value = getattr(row, name.lstrip('-'))
+            values.append(value.isoformat() if isinstance(value, datetime.datetime) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound('Invalid cursor.')
+
+    def after(self, values):
+        """Rows that sort after `values`: (a, b) > (x, y) spelt out as a Q."""
+        condition = Q()
+        for position in range(len(self.ordering) - 1, -1, -1):
+            name = self.ordering[position]
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f"{field}__{lookup}": values[position]})
+            if position < len(self.ordering) - 1:
+                step |= Q(**{field: values[position]}) & condition
+            condition = step
+        if len(self.ordering) > 1:
+            # The redundant bound on the leading column lets the database seek
+            # into the index instead of scanning it from the start
+            name = self.ordering[0]
+            lookup = 'lte' if name.startswith('-') else 'gte'
+            condition = Q(**{f"{name.lstrip('-')}__{lookup}": values[0]}) & condition
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor, queryset.model)))
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ThreadKeysetPagination(KeysetPagination):
+    """Oldest first, for comment threads."""
+    ordering = ('created_at', 'id')
+
+
+class IdKeysetPagination(KeysetPagination):
+    """Ascending id, for the trek catalog."""
+    ordering = ('id',)
+
+
+class RecentIdKeysetPagination(KeysetPagination):
+    """Newest id first, for per-user lists served by the user foreign-key index."""
+    ordering = ('-id',)
@@ -0,0 +1,109 @@
+import re
+
+MONTHS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
+_month_pattern = re.compile(r"\b(" + "|".join(month[:3] for month in MONTHS) + r")[a-z]*\b", re.IGNORECASE)
+# What may stand between the two months of a range: "March-May", "March to mid-May"
+_month_range_joiner = re.compile(
+    r"^\s*(?:-|–|—|to|through|until|till)\s*(?:(?:early|mid|late)[\s-]*)?$", re.IGNORECASE
+)
+_days_pattern = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-|–|to)?\s*(\d+(?:\.\d+)?)?\s*days?\b", re.IGNORECASE)
+_metres_pattern = re.compile(r"(\d{1,2},\d{3}|\d{3,5})\s*m\b", re.IGNORECASE)
+_usd_pattern = re.compile(r"\$\s*(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*\$?\s*(\d+(?:\.\d+)?))?")
+
+
+def parse_month(value):
+    """Month number (1-12) from a number or an English month name/abbreviation, else None."""
+    value = str(value).strip().lower()
+    if value.isdigit():
+        month = int(value)
+        return month if 1 <= month <= 12 else None
+    for number, name in enumerate(MONTHS, start=1):
+        if len(value) >= 3 and name.startswith(value):
+            return number
+    return None
+
+def parse_season_months(seasons):
+    """
+    Set of month numbers covered by best_seasons entries such as
+    "March-May", "September-May" (wrapping the year end), "mid-March to
+    May" or "October-November (Passes can have snow)". Lone month names
+    count too.
+    """
+    months = set()
+    for season in seasons or []:
+        text = str(season)
+        # Month words in order, skipping words that merely start like one ("Marsyangdi")
+        found = [(match, parse_month(match.group(0))) for match in _month_pattern.finditer(text)]
+        found = [(match, month) for match, month in found if month is not None]
+        i = 0
+        while i < len(found):
+            match, start = found[i]
+            if i + 1 < len(found) and _month_range_joiner.match(text[match.end():found[i + 1][0].start()]):
+                end = found[i + 1][1]
+                month = start
+                while True:
+                    months.add(month)
+                    if month == end:
+                        break
+                    month = month % 12 + 1
+                i += 2
+            else:
+                months.add(start)
+                i += 1
+    return months
+
+def season_bitmask(seasons):
+    """best_seasons as a 12-bit mask, bit 0 for January."""
+    mask = 0
+    for month in parse_season_months(seasons):
+        mask |= 1 << (month - 1)
+    return mask
+
+def parse_duration(text):
+    """
+    (min_days, max_days) from durations such as "12-16 days" or
+    "5-7 days (via Dhunche)"; (None, None) if no day count is found.
+    """
+    match = _days_pattern.search(str(text or ""))
+    if not match:
+        return None, None
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+def parse_elevations(text):
+    """All elevations in metres mentioned in text such as "5,545m (Kala Patthar) / 5,364m (EBC)"."""
+    return [int(value.replace(',', '')) for value in _metres_pattern.findall(str(text or ""))]
+
+def parse_usd_range(text):
+    """(low, high) dollar amounts from text such as "$5-$15/night"; (None, None) if none."""
+    match = _usd_pattern.search(str(text or ""))
+    if not match:
+        return None, None
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+def parse_elevation_range(elevation_profile):
+    """(min, max) elevation in metres from an elevation_profile dict; None where unknown."""
+    profile = elevation_profile if isinstance(elevation_profile, dict) else {}
+    highs = parse_elevations(profile.get('max_elevation'))
+    lows = parse_elevations(profile.get('min_elevation'))
+    return (min(lows) if lows else None), (max(highs) if highs else None)
+
+def parse_daily_cost(cost_breakdown):
+    """
+    (min, max) US dollars per day for accommodation plus food, from a
+    cost_breakdown dict. Guides, porters and permits are left out, as
+    they are optional or one-off. None where neither item has a price.
+    """
+    costs = cost_breakdown if isinstance(cost_breakdown, dict) else {}
+    ranges = [parse_usd_range(costs.get(item)) for item in ('accommodation', 'food')]
+    ranges = [(low, high) for low, high in ranges if low is not None]
+    if not ranges:
+        return None, None
+    return sum(low for low, _ in ranges), sum(high for _, high in ranges)
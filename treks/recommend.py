@@ -1,20 +1,86 @@
-import spacy
+import os
+import json
+import hashlib
+import shutil
+import threading
+
+import gc
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from .models import Trek
+from django.conf import settings
+from django.db import connections
+from .models import Trek, UserRecommendation
+from .catalog import get_catalog_epoch, get_catalog_version, cached_catalog_state, changes_since
+from .word_vectors import get_word_vectors
+from .utils import LRUCache
+from .collaborative import get_interaction_factors
+
+# Only the tokenizer and the vector table are used, so the trained pipes are
+# never loaded. Stop-word and punctuation flags are lexical attributes.
+SPACY_EXCLUDE = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+TREK_VECTORS_FILE = "trek_vectors.npy"
+TREK_IDS_FILE = "trek_ids.npy"
+TREK_LABELS_FILE = "trek_labels.npy"
+TREK_CENTROIDS_FILE = "trek_centroids.npy"
+TREK_STORE_META_FILE = "trek_store.json"
+# Each save goes to a new generation directory; the pointer file names the
+# live one and is swapped atomically once the generation is complete
+TREK_STORE_GENERATION_DIR = "trek_store.{generation}"
+TREK_STORE_CURRENT_FILE = "trek_store_current.json"
+# The previous generation is kept for workers still attaching to it
+TREK_STORE_KEEP_GENERATIONS = 2
+# Per-row filter attributes, one file each
+TREK_ATTRIBUTE_FILE = "trek_attr_{name}.npy"
+TREK_TEXT_ATTRIBUTES = ('difficulty', 'region', 'district')
+TREK_NUMERIC_ATTRIBUTES = {
+    'min_days': 'duration_min_days',
+    'max_days': 'duration_max_days',
+    'max_elevation': 'max_elevation_m',
+    'min_daily_cost': 'daily_cost_min_usd',
+}
+TREK_ATTRIBUTES = TREK_TEXT_ATTRIBUTES + ('season_mask',) + tuple(TREK_NUMERIC_ATTRIBUTES)
 
-# Load spaCy medium model once
-nlp = spacy.load("en_core_web_md")
+# Interest vectors shared by every profile with the same normalised interests
+_interest_vectors = LRUCache(maxsize=4096)
+# Vectors of recent semantic search queries
+_query_vectors = LRUCache(maxsize=1024)
 
-# Simple in-memory cache to avoid recalculating trek vectors
-trek_vector_cache = {}
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """
+    Loads the spaCy model on first use instead of at import time, so
+    management commands and workers that never embed text skip the cost.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load(settings.SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    return _nlp
+
+def embedding_dim():
+    table, _ = get_word_vectors()
+    return table.vectors_length if table is not None else get_nlp().vocab.vectors_length
 
 def compute_average_vector_from_text(text):
     """
     Processes the full text and averages token vectors,
     excluding stop words, punctuation, and non-vector tokens.
+    Uses the pruned word-vector table and a tokenizer-only pipeline when
+    one has been built (build_word_vectors), the full model otherwise.
     """
-    doc = nlp(text.lower())
+    table, tokenizer = get_word_vectors()
+    if table is not None:
+        doc = tokenizer.make_doc(text.lower())
+        return table.average([token.orth for token in doc if not token.is_stop and not token.is_punct])
+
+    nlp = get_nlp()
+    doc = nlp.make_doc(text.lower())
     vectors = [token.vector for token in doc if token.has_vector and not token.is_stop and not token.is_punct]
     return np.mean(vectors, axis=0) if vectors else np.zeros(nlp.vocab.vectors_length)
 
@@ -32,56 +98,611 @@ def flatten_list(json_list):
             flattened.append(str(item))
     return flattened
 
-def recommend_treks(user_profile, top_n=6):
+def build_trek_text(trek):
     """
-    Recommends top N treks based on cosine similarity between
-    user interest vector and trek content vectors.
-    Uses caching for trek vectors to speed up recommendations.
+    Combined trek content that gets embedded for recommendations.
     """
-    if not user_profile.interests:
-        return Trek.objects.none()
+    return " ".join([
+        trek.name or '',
+        trek.duration or '',
+        trek.difficulty or '',
+        trek.description or '',
+        trek.historical_significance or '',
+        " ".join(flatten_list(trek.nearby_attractions)),
+        " ".join(flatten_list(trek.tags)),
+    ])
+
+def trek_attributes(treks):
+    """
+    Filter attributes of `treks` as arrays aligned with them: lowercased
+    difficulty/region/district, the best-season month bitmask
+    (Trek.season_months) and the parsed numeric columns (NaN when unknown).
+    """
+    treks = list(treks)
+    attributes = {
+        name: np.array([(getattr(trek, name) or '').strip().lower() for trek in treks], dtype=str)
+        for name in TREK_TEXT_ATTRIBUTES
+    }
+    attributes['season_mask'] = np.array([trek.season_months for trek in treks], dtype=np.uint16)
+    for name, field in TREK_NUMERIC_ATTRIBUTES.items():
+        values = [getattr(trek, field) for trek in treks]
+        attributes[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float32)
+    return attributes
 
-    # Compute user vector
-    user_text = " ".join(user_profile.interests)
-    user_vector = compute_average_vector_from_text(user_text)
+def empty_trek_attributes(count):
+    """Attributes for rows that have none: match only unfiltered queries."""
+    attributes = {name: np.full(count, '', dtype=str) for name in TREK_TEXT_ATTRIBUTES}
+    attributes['season_mask'] = np.zeros(count, dtype=np.uint16)
+    for name in TREK_NUMERIC_ATTRIBUTES:
+        attributes[name] = np.full(count, np.nan, dtype=np.float32)
+    return attributes
 
-    # If user vector is empty, return nothing
-    if np.linalg.norm(user_vector) == 0:
-        return Trek.objects.none()
+def normalize_rows(matrix):
+    """
+    L2-normalises every row of a 2-D array. All-zero rows stay zero,
+    so they score 0 against any query.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
 
-    treks = list(Trek.objects.all())
-    similarities = []
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first. argpartition keeps this
+    linear in the number of candidates; only the k winners get sorted.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
 
-    for trek in treks:
-        trek_id = trek.id
+def top_k_rows(scores, k):
+    """Row-wise top_k_indices for a 2-D block of scores."""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(n), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
 
-        # Retrieve or compute trek vector
-        if trek_id in trek_vector_cache:
-            trek_vector = trek_vector_cache[trek_id]
-        else:
-            combined_text = " ".join([
-                trek.name or '',
-                trek.duration or '',
-                trek.difficulty or '',
-                trek.description or '',
-                trek.historical_significance or '',
-                " ".join(flatten_list(trek.nearby_attractions)),
-                " ".join(flatten_list(trek.tags)),
-            ])
-            trek_vector = compute_average_vector_from_text(combined_text)
-            trek_vector_cache[trek_id] = trek_vector
-
-        # Skip zero vectors (meaning no meaningful content)
-        if np.linalg.norm(trek_vector) == 0:
-            continue
-
-        # Compute cosine similarity
-        score = cosine_similarity([user_vector], [trek_vector])[0][0]
-        similarities.append((trek, score))
-
-    # Sort by similarity
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    recommendations = [trek for trek, score in similarities if score > 0][:top_n]
+def normalize_interests(interests):
+    """Stripped, lowercased, de-duplicated and sorted interests."""
+    return sorted({str(interest).strip().lower() for interest in interests or [] if str(interest).strip()})
+
+def interests_key(interests):
+    """Hash of the normalised interests; equal interest sets share a key."""
+    return hashlib.sha1("\n".join(normalize_interests(interests)).encode()).hexdigest()
+
+def interest_vector(interests):
+    """
+    Unit float32 vector for a set of interests, or None if none of the words
+    has a vector. Memoised by interests_key, so users with the same
+    interests share one computation.
+    """
+    key = interests_key(interests)
+    vector = _interest_vectors.get(key, False)
+    if vector is False:
+        vector = compute_average_vector_from_text(" ".join(normalize_interests(interests))).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else None
+        if vector is not None:
+            vector.flags.writeable = False
+        _interest_vectors.set(key, vector)
+    return vector
+
+def query_vector(text):
+    """
+    Unit vector of a free-text search query, or None if none of its words
+    has a vector. Queries differing only in case or spacing share a cache
+    entry, so popular queries skip the NLP pipeline.
+    """
+    key = " ".join(str(text).lower().split())
+    vector = _query_vectors.get(key, False)
+    if vector is False:
+        vector = compute_average_vector_from_text(key).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else None
+        if vector is not None:
+            vector.flags.writeable = False
+        _query_vectors.set(key, vector)
+    return vector
+
+def update_interest_vector(profile):
+    """
+    Re-embeds profile.interests if they changed since the stored vector was
+    computed. Called from UserProfile.save(); returns True when the vector
+    fields were updated.
+    """
+    key = interests_key(profile.interests)
+    if key == profile.interests_key:
+        return False
+    vector = interest_vector(profile.interests) if profile.interests else None
+    profile.interest_vector = vector.tobytes() if vector is not None else None
+    profile.interests_key = key
+    return True
+
+def get_user_vector(user_profile, dim=None):
+    """
+    The profile's stored interest vector. Profiles saved before vectors were
+    stored (or whose vector has the wrong size) are embedded once and saved.
+    """
+    vector = None
+    if user_profile.interest_vector:
+        vector = np.frombuffer(bytes(user_profile.interest_vector), dtype=np.float32)
+    stale = user_profile.interests_key != interests_key(user_profile.interests)
+    if stale or (vector is not None and dim is not None and len(vector) != dim):
+        user_profile.interests_key = ''
+        user_profile.save(update_fields=['interest_vector', 'interests_key'])
+        vector = np.frombuffer(user_profile.interest_vector, dtype=np.float32) if user_profile.interest_vector else None
+    return vector
+
+
+class TrekEmbeddingStore:
+    """
+    Contiguous float32 matrix of L2-normalised trek vectors and the trek ids
+    of its rows (sorted ascending). Persisted as .npy files so workers can
+    memory-map it instead of re-embedding the catalog on every start.
+    `version` is the catalog version the store reflects, within catalog
+    `epoch` (get_catalog_epoch()).
+
+    `labels` holds each row's Trek.cluster_label (-1 if unassigned) and
+    `centroids` the unit cluster centroids written by cluster_treks; with
+    both present, large catalogs are searched IVF-style through
+    candidate_rows().
+
+    On disk every save is a new numbered generation, published by swapping
+    a pointer file. All workers map the same generation files read-only,
+    so the page cache holds one copy of the matrix however many workers
+    run. `generation` is the one this store was saved as or loaded from
+    (0 if neither).
+
+    `attributes` holds the trek_attributes() arrays of the rows, from which
+    filter_mask() builds boolean row masks for filtered recommendations.
+    """
+
+    def __init__(self, ids, matrix, version=0, labels=None, centroids=None, generation=0, attributes=None, epoch=None):
+        self.ids = ids
+        self.matrix = matrix
+        self.version = version
+        self.epoch = epoch
+        self.generation = generation
+        self.labels = labels if labels is not None else np.full(len(ids), -1, dtype=np.int32)
+        self.centroids = centroids
+        self.attributes = attributes if attributes is not None else empty_trek_attributes(len(ids))
+        self._attribute_codes = {}
+        self._inverted_lists = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, treks=None, version=None):
+        """Embeds every trek (or the given ones) into a fresh store."""
+        if version is None:
+            # Read the version first: writes racing the build are replayed later
+            version = get_catalog_version()
+        if treks is None:
+            treks = Trek.objects.order_by('id')
+        treks = list(treks)
+        ids = []
+        labels = []
+        vectors = []
+        for trek in treks:
+            ids.append(trek.id)
+            labels.append(-1 if trek.cluster_label is None else trek.cluster_label)
+            vectors.append(compute_average_vector_from_text(build_trek_text(trek)))
+
+        matrix = np.zeros((len(ids), embedding_dim()), dtype=np.float32)
+        if vectors:
+            matrix[:] = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return cls(
+            np.asarray(ids, dtype=np.int64),
+            matrix,
+            version,
+            np.asarray(labels, dtype=np.int32),
+            attributes=trek_attributes(treks),
+            epoch=get_catalog_epoch(),
+        )
+
+    def apply_changes(self, saved_ids, deleted_ids, version):
+        """
+        Returns a new store with only the changed treks re-embedded and the
+        deleted ones dropped. The current store is left untouched, so
+        readers holding it keep a consistent view.
+        """
+        changed = np.asarray(list(saved_ids) + list(deleted_ids), dtype=np.int64)
+        keep = ~np.isin(self.ids, changed)
+        fresh = TrekEmbeddingStore.build(Trek.objects.filter(id__in=saved_ids).order_by('id'), version)
+        if self.centroids is not None and len(fresh):
+            fresh.labels = fresh.nearest_clusters(self.centroids)
+
+        ids = np.concatenate([self.ids[keep], fresh.ids])
+        matrix = np.concatenate([self.matrix[keep], fresh.matrix])
+        labels = np.concatenate([self.labels[keep], fresh.labels])
+        order = np.argsort(ids, kind='stable')
+        attributes = {
+            name: np.concatenate([self.attributes[name][keep], fresh.attributes[name]])[order]
+            for name in TREK_ATTRIBUTES
+        }
+        return TrekEmbeddingStore(
+            ids[order],
+            np.ascontiguousarray(matrix[order], dtype=np.float32),
+            version,
+            labels[order],
+            self.centroids,
+            attributes=attributes,
+            epoch=self.epoch,
+        )
+
+    def nearest_clusters(self, centroids):
+        """Label of every row's nearest centroid. Nothing is written to the database."""
+        return np.argmax(self.matrix @ centroids.T, axis=1).astype(np.int32)
+
+    def with_clusters(self, centroids, labels):
+        """Copy of the store sharing its matrix, with new cluster assignments."""
+        return TrekEmbeddingStore(
+            self.ids, self.matrix, self.version, np.asarray(labels, dtype=np.int32), centroids,
+            attributes=self.attributes, epoch=self.epoch,
+        )
+
+    def candidate_rows(self, query_vector, n_probe):
+        """
+        IVF-style candidate generation: scores the centroids, then returns the
+        rows of the n_probe best clusters plus any unassigned rows. Returns
+        None when the store has no clusters, meaning every row is a candidate.
+        """
+        if self.centroids is None or not len(self.centroids):
+            return None
+        if self._inverted_lists is None:
+            labelled = np.flatnonzero(self.labels >= 0)
+            members = labelled[np.argsort(self.labels[labelled], kind='stable')]
+            counts = np.bincount(self.labels[labelled], minlength=len(self.centroids))
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self._inverted_lists = (members, offsets, np.flatnonzero(self.labels < 0))
+        members, offsets, unassigned = self._inverted_lists
+
+        probes = top_k_indices(self.centroids @ query_vector, n_probe)
+        rows = [members[offsets[c]:offsets[c + 1]] for c in probes]
+        rows.append(unassigned)
+        return np.sort(np.concatenate(rows))
+
+    @staticmethod
+    def directory():
+        return settings.RECOMMENDER_DATA_DIR
+
+    @staticmethod
+    def current(directory=None):
+        """Pointer to the live generation ({'generation', 'version', 'epoch'}), or None."""
+        path = os.path.join(directory or TrekEmbeddingStore.directory(), TREK_STORE_CURRENT_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, directory=None):
+        """
+        Writes the store as a new generation and publishes it. Readers never
+        see a half-written generation: the pointer is replaced (atomically)
+        only once every file is in place. Generations older than the last
+        TREK_STORE_KEEP_GENERATIONS are removed; workers that still map
+        their files keep reading them until they move on.
+        """
+        directory = directory or self.directory()
+        os.makedirs(directory, exist_ok=True)
+        current = self.current(directory)
+        generation = (current['generation'] if current else 0) + 1
+        while True:
+            path = os.path.join(directory, TREK_STORE_GENERATION_DIR.format(generation=generation))
+            try:
+                os.mkdir(path)
+                break
+            except FileExistsError:
+                # Claimed by a concurrent save
+                generation += 1
+
+        arrays = [(TREK_VECTORS_FILE, self.matrix), (TREK_IDS_FILE, self.ids), (TREK_LABELS_FILE, self.labels)]
+        if self.centroids is not None:
+            arrays.append((TREK_CENTROIDS_FILE, self.centroids))
+        for name in TREK_ATTRIBUTES:
+            arrays.append((TREK_ATTRIBUTE_FILE.format(name=name), self.attributes[name]))
+        for filename, array in arrays:
+            with open(os.path.join(path, filename), 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+        with open(os.path.join(path, TREK_STORE_META_FILE), 'w') as f:
+            json.dump({
+                'version': self.version,
+                'epoch': self.epoch,
+                'count': len(self),
+                'clusters': len(self.centroids) if self.centroids is not None else 0,
+            }, f)
+        self.generation = generation
+
+        # Never move the pointer back past a newer generation published meanwhile
+        current = self.current(directory)
+        if current is None or current['generation'] < generation:
+            pointer_path = os.path.join(directory, TREK_STORE_CURRENT_FILE)
+            with open(f"{pointer_path}.tmp", 'w') as f:
+                json.dump({'generation': generation, 'version': self.version, 'epoch': self.epoch}, f)
+            os.replace(f"{pointer_path}.tmp", pointer_path)
+
+        for name in os.listdir(directory):
+            prefix, _, number = name.partition('.')
+            if prefix == 'trek_store' and number.isdigit() and int(number) <= generation - TREK_STORE_KEEP_GENERATIONS:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory=None, mmap_mode='r'):
+        """
+        Memory-maps the live generation. Returns None if nothing has been
+        built yet or if the generation was removed while being attached.
+        """
+        directory = directory or cls.directory()
+        current = cls.current(directory)
+        if current is None:
+            return None
+        path = os.path.join(directory, TREK_STORE_GENERATION_DIR.format(generation=current['generation']))
+        try:
+            with open(os.path.join(path, TREK_STORE_META_FILE)) as f:
+                meta = json.load(f)
+            matrix = np.load(os.path.join(path, TREK_VECTORS_FILE), mmap_mode=mmap_mode)
+            ids = np.load(os.path.join(path, TREK_IDS_FILE))
+            labels = np.load(os.path.join(path, TREK_LABELS_FILE))
+            centroids = np.load(os.path.join(path, TREK_CENTROIDS_FILE)) if meta['clusters'] else None
+            attributes = {
+                name: np.load(os.path.join(path, TREK_ATTRIBUTE_FILE.format(name=name)))
+                for name in TREK_ATTRIBUTES
+            }
+        except (OSError, ValueError):
+            return None
+        if len(ids) != matrix.shape[0] or len(ids) != meta['count'] or len(labels) != len(ids):
+            return None
+        if any(len(values) != len(ids) for values in attributes.values()):
+            return None
+        return cls(ids, matrix, meta['version'], labels, centroids, current['generation'], attributes, meta.get('epoch'))
+
+    @staticmethod
+    def stored_version(directory=None):
+        """Catalog version of the live generation on disk, without loading it."""
+        current = TrekEmbeddingStore.current(directory)
+        return current['version'] if current else -1
+
+    def _text_match(self, name, predicate):
+        """
+        Row mask of a text attribute, testing `predicate` once per distinct
+        value and expanding the result through the value codes.
+        """
+        if name not in self._attribute_codes:
+            self._attribute_codes[name] = np.unique(self.attributes[name], return_inverse=True)
+        values, codes = self._attribute_codes[name]
+        matches = np.fromiter((predicate(value) for value in values), dtype=bool, count=len(values))
+        return matches[codes]
+
+    def filter_mask(self, filters):
+        """
+        Boolean mask of the rows matching `filters`, or None when there is
+        nothing to filter on. Supported keys: difficulty (list of levels,
+        exact), region and district (substring), month (1-12, from
+        best_seasons), min_days and max_days (treks that can be done in at
+        least / at most that many days), max_elevation (metres) and
+        max_daily_cost (cheapest daily spend, US dollars). Matching ignores
+        case.
+        """
+        if not filters:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if filters.get('difficulty'):
+            levels = {level.strip().lower() for level in filters['difficulty']}
+            mask &= self._text_match('difficulty', levels.__contains__)
+        for name in ('region', 'district'):
+            if filters.get(name):
+                needle = filters[name].strip().lower()
+                mask &= self._text_match(name, lambda value: needle in value)
+        if filters.get('month'):
+            mask &= (self.attributes['season_mask'] & (1 << (filters['month'] - 1))) != 0
+        if filters.get('max_days') is not None:
+            mask &= self.attributes['min_days'] <= filters['max_days']
+        if filters.get('min_days') is not None:
+            mask &= self.attributes['max_days'] >= filters['min_days']
+        if filters.get('max_elevation') is not None:
+            mask &= self.attributes['max_elevation'] <= filters['max_elevation']
+        if filters.get('max_daily_cost') is not None:
+            mask &= self.attributes['min_daily_cost'] <= filters['max_daily_cost']
+        return mask
+
+    def scores(self, query_vector, rows=None):
+        """Cosine score of every row (or the given rows) against a unit query vector."""
+        if rows is None:
+            return self.matrix @ query_vector
+        return self.matrix[rows] @ query_vector
+
+    def top_k(self, query_vector, k):
+        """
+        Scores all treks against a unit query vector with a single
+        matrix-vector product. Returns (trek_ids, scores), best first.
+        """
+        scores = self.scores(query_vector)
+        top = top_k_indices(scores, k)
+        return self.ids[top], scores[top]
+
+
+_trek_store = None
+# cached_catalog_state() the store was last checked against
+_trek_store_state = None
+_trek_store_lock = threading.Lock()
+
+def get_trek_store():
+    """
+    Process-wide embedding store, attached to the live generation on disk
+    on first use and built (then saved) if no store exists yet.
+
+    While the cached catalog state is unchanged the store is returned as
+    is. Otherwise it is compared against the catalog epoch and version and
+    the published generation: a newer generation (saved by another worker
+    or by cluster_treks) is attached; failing that, when treks changed, only
+    the changed treks are re-embedded and the result is published for the
+    other workers. A store of another epoch (an older database) is rebuilt.
+    """
+    global _trek_store, _trek_store_state
+    state = cached_catalog_state()
+    store = _trek_store
+    if store is not None and state == _trek_store_state:
+        return store
+
+    with _trek_store_lock:
+        epoch = get_catalog_epoch()
+        version = get_catalog_version()
+        current = TrekEmbeddingStore.current()
+        generation = current['generation'] if current else 0
+        store = _trek_store
+        if store is None or store.generation < generation:
+            store = TrekEmbeddingStore.load() or store
+        if store is None or store.epoch != epoch:
+            store = TrekEmbeddingStore.build()
+            store.save()
+        if store.version < version:
+            version, saved_ids, deleted_ids = changes_since(store.version)
+            store = store.apply_changes(saved_ids, deleted_ids, version)
+            store.save()
+        _trek_store = store
+        _trek_store_state = state
+    return store
+
+def sync_cluster_labels(store):
+    """
+    Writes the store's cluster assignments to Trek.cluster_label where they
+    differ (treks saved since cluster_treks get their nearest centroid when
+    the store catches up) and returns the ids of the relabelled treks. Does
+    nothing before cluster_treks has stored centroids.
+    """
+    if store.centroids is None or not len(store):
+        return []
+    saved = dict(Trek.objects.values_list('id', 'cluster_label'))
+    changed = [
+        Trek(id=trek_id, cluster_label=label)
+        for trek_id, label in zip(store.ids.tolist(), store.labels.tolist())
+        if trek_id in saved and saved[trek_id] != label
+    ]
+    Trek.objects.bulk_update(changed, ['cluster_label'], batch_size=1000)
+    return [trek.id for trek in changed]
+
+def preload():
+    """
+    Loads the word vectors (pruned table, or the spaCy model if none was
+    built) and the embedding store up front. Called from the WSGI module
+    when gunicorn runs with --preload, so forked workers share these pages
+    copy-on-write instead of each loading their own copy.
+    """
+    embedding_dim()
+    get_trek_store()
+    # Workers must not inherit the master's database connection
+    connections.close_all()
+    # Keep the garbage collector from touching (and so copying) preloaded objects
+    gc.freeze()
+
+def blend_scores(content_scores, cf_scores, cf_weight=None):
+    """
+    Weighted sum of content and collaborative-filtering scores (1-D or 2-D).
+    Either side may be None, in which case the other is used as is.
+    """
+    if cf_scores is None:
+        return content_scores
+    if content_scores is None:
+        return cf_scores
+    if cf_weight is None:
+        cf_weight = settings.RECOMMENDER_CF_WEIGHT
+    return (1 - cf_weight) * content_scores + cf_weight * cf_scores
+
+def precomputed_recommendations(user_profile, top_n=6):
+    """
+    Treks stored for the user by precompute_recommendations, or None if there
+    is no stored result or the user's interests changed since it was made.
+    """
+    try:
+        stored = UserRecommendation.objects.get(user=user_profile)
+    except UserRecommendation.DoesNotExist:
+        return None
+    if stored.interests_key != interests_key(user_profile.interests):
+        return None
+
+    trek_ids = stored.trek_ids[:top_n]
+    treks_by_id = Trek.objects.in_bulk(trek_ids)
+    return [treks_by_id[trek_id] for trek_id in trek_ids if trek_id in treks_by_id]
+
+def candidate_rows(store, query_vector, mask=None):
+    """
+    Store rows worth scoring for a query: the rows allowed by `mask`, cut
+    down to the closest clusters when there are many of them. None means
+    every row.
+    """
+    rows = None
+    if mask is not None:
+        rows = np.flatnonzero(mask)
+    # Large clustered candidate sets only score the members of the closest clusters
+    if query_vector is not None and (len(store) if rows is None else len(rows)) >= settings.RECOMMENDER_IVF_MIN_TREKS:
+        probed = store.candidate_rows(query_vector, settings.RECOMMENDER_IVF_PROBES)
+        if probed is not None:
+            rows = probed if mask is None else probed[mask[probed]]
+    return rows
+
+def rank_trek_ids(store, user_vector, user_id=None, factors=None, top_n=6, mask=None):
+    """
+    Ids of the top N treks of `store` for a user vector (or None) and the
+    user's collaborative-filtering affinities, best first. Only positive
+    scores are kept; returns None when neither signal is available.
+    With a filter `mask`, only the matching rows are scored at all.
+    """
+    rows = candidate_rows(store, user_vector, mask)
+    candidate_ids = store.ids if rows is None else store.ids[rows]
+
+    cf_scores = None
+    if factors is not None and user_id is not None:
+        cf_scores = factors.scores_for(user_id, candidate_ids)
+
+    if user_vector is None and cf_scores is None:
+        return None
+
+    content_scores = store.scores(user_vector, rows) if user_vector is not None else None
+    scores = blend_scores(content_scores, cf_scores)
+
+    top = top_k_indices(scores, top_n)
+    return candidate_ids[top][scores[top] > 0].tolist()
+
+def recommend_treks(user_profile, top_n=6, filters=None):
+    """
+    Recommends top N treks based on cosine similarity between
+    user interest vector and trek content vectors, blended with the
+    collaborative-filtering affinities learnt from UserTrekInteraction
+    (weight RECOMMENDER_CF_WEIGHT) when a factor model knows the user.
+    Trek vectors come from the persisted embedding store and the user vector
+    is stored on the profile, so a request does no NLP: scoring is one
+    matrix-vector product per signal plus an argpartition top-k.
+    `filters` (see TrekEmbeddingStore.filter_mask) restrict the treks scored.
+    """
+    store = get_trek_store()
+    user_vector = None
+    if user_profile.interests:
+        user_vector = get_user_vector(user_profile, store.matrix.shape[1])
+
+    trek_ids = rank_trek_ids(
+        store, user_vector, user_profile.id, get_interaction_factors(), top_n, store.filter_mask(filters)
+    )
+
+    # Neither signal available, return nothing
+    if trek_ids is None:
+        return Trek.objects.none()
+
+    treks_by_id = Trek.objects.in_bulk(trek_ids)
+    recommendations = [treks_by_id[trek_id] for trek_id in trek_ids if trek_id in treks_by_id]
 
     print(f"Recommended {len(recommendations)} treks for user {user_profile.user.username} based on interests: {user_profile.interests}")
     return recommendations
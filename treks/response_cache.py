@@ -0,0 +1,70 @@
+import functools
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+from .catalog import cached_catalog_state
+from .conditional import request_variant
+
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def response_cache_key(request):
+    """
+    Catalog epoch and version plus the request variant: a catalog write (or
+    a new database) orphans every key.
+    """
+    epoch, version, _ = cached_catalog_state()
+    return f"trek-response:{epoch}:{version}:{request_variant(request)}"
+
+
+def cached_catalog_response(method):
+    """
+    Caches a successful GET's data (or, for responses assembled from stored
+    JSON, its bytes) and validators in the local LRU tier and
+    the shared tier, keyed by response_cache_key. A hit is answered without
+    touching the ORM; it still honours If-None-Match / If-Modified-Since.
+    Apply outside catalog_condition, so misses store the validators it adds.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return method(self, request, *args, **kwargs)
+
+        local, shared = caches['default'], caches['shared']
+        key = response_cache_key(request)
+        entry = local.get(key)
+        if entry is None:
+            entry = shared.get(key)
+            if entry is not None:
+                local.set(key, entry, settings.TREK_RESPONSE_CACHE_TIMEOUT)
+
+        if entry is not None:
+            kind, payload, headers = entry
+            headers = dict(headers)
+            if kind == 'data':
+                response = Response(payload, headers=headers)
+            else:
+                response = HttpResponse(payload, content_type=headers.pop('Content-Type'), headers=headers)
+            return get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers.get('Last-Modified')),
+                response=response,
+            )
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+            if isinstance(response, Response):
+                entry = ('data', response.data, headers)
+            else:
+                headers['Content-Type'] = response['Content-Type']
+                entry = ('content', response.content, headers)
+            local.set(key, entry, settings.TREK_RESPONSE_CACHE_TIMEOUT)
+            shared.set(key, entry, settings.TREK_RESPONSE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,140 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from .models import Trek
+from .recommend import get_trek_store, query_vector, candidate_rows, top_k_indices
+
+# bm25() weights, in treks_trek_fts column order: name, district, region,
+# description, historical_significance, itinerary, nearby_attractions, tags
+FTS_WEIGHTS = (10.0, 3.0, 3.0, 1.0, 1.0, 0.5, 2.0, 4.0)
+
+_term_pattern = re.compile(r"\w+", re.UNICODE)
+
+FTS_COLUMNS = [
+    'name', 'district', 'region', 'description', 'historical_significance',
+    'itinerary', 'nearby_attractions', 'tags',
+]
+FTS_JSON_COLUMNS = {'itinerary', 'nearby_attractions', 'tags'}
+
+
+def _fts_values(prefix):
+    """Column values to index; JSON columns contribute their string leaves."""
+    return ", ".join(
+        f"(SELECT group_concat(value, ' ') FROM json_tree({prefix}{column}) WHERE type = 'text')"
+        if column in FTS_JSON_COLUMNS else f"{prefix}{column}"
+        for column in FTS_COLUMNS
+    )
+
+_fts_insert = f"INSERT INTO treks_trek_fts (rowid, {', '.join(FTS_COLUMNS)})"
+
+FTS_TRIGGERS = {
+    'treks_trek_fts_insert': f"""CREATE TRIGGER treks_trek_fts_insert AFTER INSERT ON treks_trek BEGIN
+        {_fts_insert} VALUES (new.id, {_fts_values('new.')});
+    END""",
+    'treks_trek_fts_update': f"""CREATE TRIGGER treks_trek_fts_update AFTER UPDATE ON treks_trek BEGIN
+        DELETE FROM treks_trek_fts WHERE rowid = old.id;
+        {_fts_insert} VALUES (new.id, {_fts_values('new.')});
+    END""",
+    'treks_trek_fts_delete': """CREATE TRIGGER treks_trek_fts_delete AFTER DELETE ON treks_trek BEGIN
+        DELETE FROM treks_trek_fts WHERE rowid = old.id;
+    END""",
+}
+
+
+def ensure_search_index(using='default'):
+    """
+    Recreates the FTS sync triggers if they are missing and reindexes the
+    catalog. SQLite drops a table's triggers whenever a migration rebuilds
+    the table (as it does for most field changes), so this runs after every
+    migrate. Returns True if the index had to be rebuilt.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE %s", ['treks_trek_fts%'])
+        existing = {name for _, name in cursor.fetchall()}
+        # Not migrated that far yet
+        if 'treks_trek_fts' not in existing:
+            return False
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        if not missing:
+            return False
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        cursor.execute("DELETE FROM treks_trek_fts")
+        cursor.execute(f"{_fts_insert} SELECT id, {_fts_values('')} FROM treks_trek")
+    return True
+
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for free text: every word must match, the last
+    one as a prefix so partially typed queries still find results. Words are
+    quoted, so user input can never form FTS5 syntax. Returns '' if the text
+    has no words.
+    """
+    terms = _term_pattern.findall(text)
+    if not terms:
+        return ''
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+def search_treks(text, limit=20, offset=0):
+    """
+    Treks matching `text`, best BM25 match first, as (trek, snippet, score)
+    tuples. The snippet marks matched words with <b></b>. Databases without
+    FTS5 get a plain case-insensitive search with no snippets, in id order.
+    """
+    query = fts_query(text)
+    if not query:
+        return []
+
+    if connection.vendor != 'sqlite':
+        condition = Q()
+        for term in _term_pattern.findall(text):
+            condition &= Q(name__icontains=term) | Q(description__icontains=term) | Q(region__icontains=term)
+        return [(trek, None, None) for trek in Trek.objects.filter(condition).order_by('id')[offset:offset + limit]]
+
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid, bm25(treks_trek_fts, {weights}) AS score,
+                   snippet(treks_trek_fts, -1, '<b>', '</b>', '…', 16)
+            FROM treks_trek_fts
+            WHERE treks_trek_fts MATCH %s
+            ORDER BY score
+            LIMIT %s OFFSET %s
+            """,
+            [query, limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    treks_by_id = Trek.objects.in_bulk([row[0] for row in rows])
+    # bm25() is lower-is-better; negate it so higher scores rank first
+    return [(treks_by_id[trek_id], snippet, -score) for trek_id, score, snippet in rows if trek_id in treks_by_id]
+
+def semantic_search(text, limit=20, filters=None):
+    """
+    Treks whose content vectors are closest to the embedded query, as
+    (trek, score) tuples, best first. Scoring is one matrix-vector product
+    over the embedding store and an argpartition top-k. `filters` are
+    applied as in recommendations.
+    """
+    vector = query_vector(text)
+    if vector is None:
+        return []
+    store = get_trek_store()
+    rows = candidate_rows(store, vector, store.filter_mask(filters))
+    candidate_ids = store.ids if rows is None else store.ids[rows]
+    scores = store.scores(vector, rows)
+
+    top = top_k_indices(scores, limit)
+    top = top[scores[top] > 0]
+    treks_by_id = Trek.objects.in_bulk(candidate_ids[top].tolist())
+    return [
+        (treks_by_id[trek_id], float(score))
+        for trek_id, score in zip(candidate_ids[top].tolist(), scores[top].tolist())
+        if trek_id in treks_by_id
+    ]
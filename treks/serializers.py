@@ -7,6 +7,103 @@ from .models import (
 )
 
 
+def _param_list(request, name):
+    """Comma-separated query parameter as a list of names."""
+    value = request.query_params.get(name, '') if request is not None else ''
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets for GET requests. On the top-level serializer,
+    `?fields=a,b` keeps only the named fields and `?expand=c` adds fields
+    left out by default. Meta.default_fields (optional) lists the fields
+    rendered when no `fields` are asked for, which is also all a nested use
+    renders. Meta.compact_fields maps a field to a factory for the smaller
+    field `?compact=c` swaps in, and Meta.field_sources names the model
+    columns behind method fields, for only_fields().
+    """
+
+    def _is_request_root(self):
+        return self.root is self or (
+            self.parent is self.root and isinstance(self.root, serializers.ListSerializer)
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None and (request.method not in ('GET', 'HEAD') or not self._is_request_root()):
+            request = None
+
+        requested = _param_list(request, 'fields')
+        expand = _param_list(request, 'expand')
+        compact = _param_list(request, 'compact')
+        default = getattr(self.Meta, 'default_fields', None) or list(fields)
+        if requested:
+            selected = set(requested) | {'id'}
+        else:
+            selected = set(default) | set(expand)
+
+        compactable = getattr(self.Meta, 'compact_fields', {})
+        trimmed = {}
+        for name, field in fields.items():
+            if name not in selected:
+                continue
+            trimmed[name] = compactable[name]() if name in compact and name in compactable else field
+        return trimmed
+
+    @classmethod
+    def only_fields(cls, request):
+        """
+        Model columns (as .only() paths) read when rendering `request`, so
+        querysets can skip everything else.
+        """
+        serializer = cls(context={'request': request})
+        return sorted(_column_paths(serializer, serializer.Meta.model))
+
+    @classmethod
+    def restrict_queryset(cls, queryset, request):
+        """
+        `queryset` reading only the only_fields() columns, joined to the
+        relations those columns reach and no others: .only() cannot defer a
+        relation that select_related() traverses.
+        """
+        columns = cls.only_fields(request)
+        related = sorted({column.rsplit('__', 1)[0] for column in columns if '__' in column})
+        return queryset.select_related(None).select_related(*related).only(*columns)
+
+
+def _column_paths(serializer, model, prefix=''):
+    paths = {f"{prefix}{model._meta.pk.name}"}
+    field_sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_sources:
+            paths.update(f"{prefix}{source}" for source in field_sources[name])
+            continue
+        if field.source == '*':
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            try:
+                related = model._meta.get_field(field.source)
+            except Exception:
+                continue
+            if related.many_to_one or related.one_to_one:
+                paths.add(f"{prefix}{field.source}")
+                paths.update(_column_paths(nested, related.related_model, f"{prefix}{field.source}__"))
+            continue
+        # Only concrete columns of this model; dotted sources and properties are skipped
+        try:
+            model_field = model._meta.get_field(field.source)
+        except Exception:
+            continue
+        if model_field.concrete:
+            paths.add(f"{prefix}{field.source}")
+    return paths
+
+
 class UserProfileInlineSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
@@ -68,12 +165,24 @@ class UserProfileMiniSerializer(serializers.ModelSerializer):
         fields = ['id', 'display_name', 'photo_url']
 
 
-class TrekSerializer(serializers.ModelSerializer):
+class TrekSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Trek
         fields = '__all__'
 
 
+class TrekListSerializer(TrekSerializer):
+    """Compact trek for catalog screens: identity, region, difficulty and one photo"""
+    photo = serializers.SerializerMethodField()
+
+    class Meta(TrekSerializer.Meta):
+        default_fields = ['id', 'name', 'district', 'region', 'difficulty', 'duration', 'photo']
+        field_sources = {'photo': ['photos']}
+
+    def get_photo(self, obj):
+        return obj.photos[0] if obj.photos else None
+
+
 class TimsApplicationSerializer(serializers.ModelSerializer):
     class Meta:
         model = TimsApplication
@@ -172,7 +281,7 @@ class LikeSerializer(serializers.ModelSerializer):
             )
         return attrs
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     trek = TrekSerializer(read_only=True)  
     trek_id = serializers.IntegerField(write_only=True)  
     
@@ -180,6 +289,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['id', 'created_at', 'user', 'trek', 'trek_id']
         read_only_fields = ['user']
+        compact_fields = {'trek': lambda: TrekListSerializer(read_only=True)}
     
     def create(self, validated_data):
         trek_id = validated_data.pop('trek_id')
@@ -218,7 +328,7 @@ class UserSignupSerializer(serializers.ModelSerializer):
         return user
 
 
-class TimsApplicationSerializer(serializers.ModelSerializer):
+class TimsApplicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     trek_details = TrekSerializer(source='trek', read_only=True)
     trek_id = serializers.IntegerField(write_only=True)
 
@@ -238,6 +348,7 @@ class TimsApplicationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'tims_card_no', 'encrypted_qr_code', 
                            'created_at', 'updated_at']
+        compact_fields = {'trek_details': lambda: TrekListSerializer(source='trek', read_only=True)}
     
     def update(self, instance, validated_data):
         # Pop profile data from validated_data
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Trek
+from .catalog import record_trek_changes
+from .blobs import store_trek_blobs
+
+
+@receiver(post_save, sender=Trek)
+def trek_saved(sender, instance, **kwargs):
+    """
+    Bumps the catalog version so workers re-embed this trek, and re-renders
+    its JSON. Cluster labels and similar-trek lists catch up in batches
+    (cluster_treks --assign, build_similar_treks).
+    """
+    record_trek_changes([instance.id], 'saved')
+    store_trek_blobs([instance])
+
+@receiver(post_delete, sender=Trek)
+def trek_deleted(sender, instance, **kwargs):
+    """Bumps the catalog version so workers drop this trek."""
+    record_trek_changes([instance.id], 'deleted')
@@ -0,0 +1,130 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from .models import Trek, SimilarTrek, CatalogState
+from .catalog import changes_since
+from .recommend import top_k_rows
+
+# Rows scored per block product, capped so a block stays around 16 MB
+SIMILAR_BLOCK_CELLS = 4 * 1024 * 1024
+
+
+def similar_treks_version():
+    """Catalog version the table was last brought up to, or -1 if never built."""
+    return CatalogState.current().similar_treks_version
+
+def _save_version(version):
+    """Moves the table's version forward (never back past a concurrent update)."""
+    CatalogState.current()
+    CatalogState.objects.filter(pk=1, similar_treks_version__lt=version).update(similar_treks_version=version)
+
+def _rows_of(store, trek_ids):
+    """Store rows of the given trek ids, skipping ids the store lacks."""
+    trek_ids = np.asarray(trek_ids, dtype=np.int64)
+    rows = np.searchsorted(store.ids, trek_ids)
+    rows[rows == len(store.ids)] = 0
+    return rows[store.ids[rows] == trek_ids] if len(store.ids) else rows[:0]
+
+def _write_neighbours(store, rows, k):
+    """
+    Recomputes the neighbour lists of the given store rows, one block
+    product per chunk, and replaces their SimilarTrek rows.
+    """
+    block = max(1, SIMILAR_BLOCK_CELLS // max(len(store), 1))
+    for start in range(0, len(rows), block):
+        chunk = rows[start:start + block]
+        scores = store.matrix[chunk] @ store.matrix.T
+        scores[np.arange(len(chunk)), chunk] = -np.inf
+        neighbours = top_k_rows(scores, k)
+
+        entries = []
+        for i, row in enumerate(chunk):
+            rank = 0
+            for column in neighbours[i]:
+                score = float(scores[i, column])
+                if score <= 0:
+                    break
+                entries.append(SimilarTrek(
+                    trek_id=int(store.ids[row]),
+                    similar_id=int(store.ids[column]),
+                    rank=rank,
+                    score=score,
+                ))
+                rank += 1
+
+        with transaction.atomic():
+            SimilarTrek.objects.filter(trek_id__in=store.ids[chunk].tolist()).delete()
+            SimilarTrek.objects.bulk_create(entries)
+
+def rebuild_similar_treks(store, k=None):
+    """Recomputes the whole table."""
+    k = k or settings.SIMILAR_TREKS_COUNT
+    SimilarTrek.objects.exclude(trek_id__in=store.ids.tolist()).delete()
+    _write_neighbours(store, np.arange(len(store)), k)
+    _save_version(store.version)
+    return len(store)
+
+def update_similar_treks(store, saved_ids, deleted_ids, k=None):
+    """
+    Rebuilds only the lists a catalog change can affect: those of the
+    changed treks, those that point at a changed or deleted trek, and those
+    whose current last neighbour a changed trek now beats.
+    Returns the number of lists rebuilt.
+    """
+    k = k or settings.SIMILAR_TREKS_COUNT
+    saved_ids = np.asarray(saved_ids, dtype=np.int64)
+    changed_ids = np.concatenate([saved_ids, np.asarray(deleted_ids, dtype=np.int64)])
+    if not len(changed_ids):
+        return 0
+
+    affected = set(saved_ids.tolist())
+    affected.update(
+        SimilarTrek.objects.filter(similar_id__in=changed_ids.tolist()).values_list('trek_id', flat=True)
+    )
+
+    changed_rows = _rows_of(store, saved_ids)
+    if len(changed_rows):
+        # Current cut-off score of every full list; shorter lists take anything positive
+        thresholds = np.zeros(len(store), dtype=np.float32)
+        last = np.array(list(SimilarTrek.objects.filter(rank=k - 1).values_list('trek_id', 'score')))
+        if len(last):
+            trek_ids = last[:, 0].astype(np.int64)
+            rows = _rows_of(store, trek_ids)
+            thresholds[rows] = last[np.isin(trek_ids, store.ids), 1]
+        best = (store.matrix @ store.matrix[changed_rows].T).max(axis=1)
+        affected.update(store.ids[best > thresholds].tolist())
+
+    SimilarTrek.objects.filter(trek_id__in=np.asarray(deleted_ids, dtype=np.int64).tolist()).delete()
+    rows = _rows_of(store, sorted(affected))
+    _write_neighbours(store, rows, k)
+    return len(rows)
+
+
+_similar_lock = threading.Lock()
+
+def ensure_similar_treks(store):
+    """
+    Brings the table up to the store's catalog version, incrementally when
+    it was built before and from scratch otherwise.
+    """
+    with _similar_lock:
+        version = similar_treks_version()
+        if version < 0:
+            rebuild_similar_treks(store)
+        elif version < store.version:
+            _, saved_ids, deleted_ids = changes_since(version)
+            update_similar_treks(store, saved_ids, deleted_ids)
+            _save_version(store.version)
+
+def similar_treks(trek_id, limit=None):
+    """Precomputed neighbours of a trek, most similar first. Only reads the table."""
+    limit = limit or settings.SIMILAR_TREKS_COUNT
+    similar_ids = list(
+        SimilarTrek.objects.filter(trek_id=trek_id, rank__lt=limit)
+        .order_by('rank')
+        .values_list('similar_id', flat=True)
+    )
+    treks_by_id = Trek.objects.in_bulk(similar_ids)
+    return [treks_by_id[similar_id] for similar_id in similar_ids if similar_id in treks_by_id]
@@ -0,0 +1,106 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import resolve, get_script_prefix
+from .blobs import render_json
+
+# Parent headers a sub-request must not inherit: its body, and anything that
+# would make it answer with something other than a whole JSON document
+DROPPED_HEADERS = (
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_ACCEPT_ENCODING', 'HTTP_RANGE', 'HTTP_IF_RANGE',
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+
+def subrequest_path(url):
+    """(path_info, query string) of a same-site URL or path."""
+    parts = urlsplit(url)
+    prefix = get_script_prefix()
+    path = parts.path
+    if prefix != '/' and path.startswith(prefix):
+        path = '/' + path[len(prefix):]
+    return path, parts.query
+
+
+def _environ(request, path, query):
+    environ = {key: value for key, value in request.META.items() if key not in DROPPED_HEADERS}
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': io.BytesIO(b''),
+    })
+    environ.setdefault('SCRIPT_NAME', '')
+    return environ
+
+
+def _run(request, match, path, query):
+    """One sub-request as (status, JSON bytes or None), on this thread's own connections."""
+    sub = WSGIRequest(_environ(request, path, query))
+    sub.user = request.user
+    if request.user.is_authenticated:
+        # Authenticated once by the batch request; DRF takes these instead of re-checking the token
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            # Files and other non-JSON bodies are not embedded
+            response.close()
+            return response.status_code, None
+        return response.status_code, response.content or None
+    except Exception as e:
+        return 500, render_json({"success": False, "error": str(e)})
+    finally:
+        connections.close_all()
+
+
+def run_subrequests(request, items, exclude_view=None):
+    """
+    Runs the GET sub-requests `items` ((id, url) pairs) through their views
+    as the batch request's user, concurrently on up to BATCH_MAX_WORKERS
+    threads, and returns the combined JSON body:
+    `{"success": true, "responses": [{"id", "status", "body"}, ...]}` in
+    request order. Bodies are spliced in as the views rendered them.
+    Middleware does not run for sub-requests.
+    """
+    tasks = []
+    for request_id, url in items:
+        path, query = subrequest_path(url)
+        try:
+            match = resolve(path)
+        except Http404:
+            match = None
+        if match is not None and exclude_view is not None and getattr(match.func, 'view_class', None) is exclude_view:
+            match = None
+        tasks.append((request_id, match, path, query))
+
+    # Looked up once here, then shared by every sub-request
+    if request.user.is_authenticated:
+        getattr(request.user, 'profile', None)
+
+    runnable = sum(1 for _, match, _, _ in tasks if match is not None)
+    workers = max(1, min(runnable, settings.BATCH_MAX_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run, request, match, path, query) if match is not None else None
+            for _, match, path, query in tasks
+        ]
+        results = [future.result() if future is not None else (404, None) for future in futures]
+
+    parts = [
+        b'{"id":' + (render_json(request_id) or b'null') + b',"status":' + str(status).encode()
+        + b',"body":' + (body if body is not None else b'null') + b'}'
+        for (request_id, _, _, _), (status, body) in zip(tasks, results)
+    ]
+    return b'{"success":true,"responses":[' + b','.join(parts) + b']}'
@@ -0,0 +1,64 @@
+import gzip
+import zlib
+
+from django.core.cache import caches
+from .models import Trek, TrekBlob
+from .catalog import changes_since, get_catalog_epoch, get_catalog_version
+from .blobs import render_json, store_trek_blobs
+
+SYNC_BATCH_SIZE = 500
+SYNC_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _detail_items(trek_ids):
+    """Detail JSON of the given treks that still exist, in id order, rendering missing blobs."""
+    items = {}
+    for start in range(0, len(trek_ids), SYNC_BATCH_SIZE):
+        batch = trek_ids[start:start + SYNC_BATCH_SIZE]
+        for trek_id, blob in TrekBlob.objects.filter(trek_id__in=batch).values_list('trek_id', 'detail_json'):
+            items[trek_id] = blob
+        missing = [trek_id for trek_id in batch if trek_id not in items]
+        if missing:
+            for blob in store_trek_blobs(Trek.objects.filter(id__in=missing)):
+                items[blob.trek_id] = blob.detail_json
+    return [zlib.decompress(items[trek_id]) for trek_id in trek_ids if trek_id in items]
+
+
+def catalog_delta(since, epoch=None):
+    """
+    Gzipped `{"version", "epoch", "full", "deleted", "treks"}` bringing a
+    client at catalog version `since` up to date: the full detail of every
+    trek saved since, and the ids of those deleted since. The work follows
+    the change log after `since`, not the catalog size. A client with no
+    version, one ahead of the server, or one that synced with another
+    catalog epoch (the database was recreated) gets everything.
+
+    Deltas are cached in the shared cache per (epoch, since, version), as
+    clients that synced at the same time ask for the same one.
+    """
+    cache = caches['shared']
+    current_epoch = get_catalog_epoch()
+    current = get_catalog_version()
+    if since < 0 or since > current or (epoch is not None and epoch != current_epoch):
+        since = 0
+    body = cache.get(f"trek-sync:{current_epoch}:{since}:{current}")
+    if body is not None:
+        return body
+
+    full = since == 0
+    if full:
+        version = current
+        saved = list(Trek.objects.order_by('id').values_list('id', flat=True))
+        deleted = []
+    else:
+        version, saved, deleted = changes_since(since)
+
+    body = gzip.compress(
+        b'{"version":' + render_json(version)
+        + b',"epoch":' + render_json(current_epoch)
+        + b',"full":' + render_json(full)
+        + b',"deleted":' + render_json(deleted)
+        + b',"treks":[' + b','.join(_detail_items(saved)) + b']}'
+    )
+    cache.set(f"trek-sync:{current_epoch}:{since}:{version}", body, SYNC_CACHE_TIMEOUT)
+    return body
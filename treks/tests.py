@@ -1,3 +1,905 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+import numpy as np
+import spacy
+from rest_framework.test import APIClient
+
+from .models import Trek, EmergencyContactPoint, Post, SimilarTrek, Favorite, TimsApplication, UserProfile, UserRecommendation, UserTrekInteraction
+from . import autocomplete, batch, collaborative, recommend, word_vectors
+from .batch import precompute_recommendations
+from .filters import trek_filters_from_params, filter_trek_queryset
+from .blobs import rebuild_trek_blobs
+from .catalog import get_catalog_epoch, publish_catalog_labels
+from .recommend import TrekEmbeddingStore, get_trek_store
+from .word_vectors import WordVectorTable, INTEREST_VOCABULARY
+from .parsing import parse_duration, parse_elevation_range, parse_daily_cost, parse_season_months, season_bitmask
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'treks-tests-default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'treks-tests-shared'},
+}
+
+
+def catalog_treks(count):
+    """The first `count` treks of treks.json, as Trek field values."""
+    with open(settings.BASE_DIR / 'treks.json', encoding='utf-8') as f:
+        data = json.load(f)
+    fields = {field.name for field in Trek._meta.get_fields() if field.concrete and field.editable}
+    return [{name: value for name, value in item.items() if name in fields} for item in data[:count]]
+
+
+class CatalogTestCase(TestCase):
+    """
+    Isolated caches and recommender data, so nothing leaks between runs.
+    Each test works on a copy of the class's data directory, as the files
+    outlive the rollback of the test's database writes.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data_dir = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(CACHES=TEST_CACHES, RECOMMENDER_DATA_DIR=cls.data_dir))
+        cls.reset_loaded_models()
+        cls.setUpDataDir()
+        super().setUpClass()
+
+    @classmethod
+    def setUpDataDir(cls):
+        """Runs before setUpTestData(), with RECOMMENDER_DATA_DIR in place."""
+
+    def setUp(self):
+        data_dir = self.enterContext(tempfile.TemporaryDirectory())
+        shutil.copytree(self.data_dir, data_dir, dirs_exist_ok=True)
+        self.enterContext(override_settings(RECOMMENDER_DATA_DIR=data_dir))
+        caches['default'].clear()
+        caches['shared'].clear()
+        self.reset_loaded_models()
+        self.client = APIClient()
+
+    @staticmethod
+    def reset_loaded_models():
+        """Drops the process-wide models, which may come from another test's directory."""
+        word_vectors._word_vectors = word_vectors._tokenizer = None
+        recommend._trek_store = None
+        recommend._interest_vectors.clear()
+        recommend._query_vectors.clear()
+        autocomplete._index = autocomplete._index_mtime = None
+        collaborative._factors = collaborative._factors_mtime = None
+
+
+class RecommenderTestCase(CatalogTestCase):
+    """
+    Saves a small word-vector table, one pseudo-random vector per word of
+    treks.json, in place of the spaCy model the tests cannot rely on.
+    """
+
+    @classmethod
+    def setUpDataDir(cls):
+        with open(settings.BASE_DIR / 'treks.json', encoding='utf-8') as f:
+            words = set(re.findall(r"[a-z]+", f.read().lower())) | set(INTEREST_VOCABULARY)
+        strings = spacy.blank('en').vocab.strings
+        keys = np.array(sorted(strings.add(word) for word in words), dtype=np.uint64)
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(strings[int(key)].encode())).standard_normal(16) for key in keys
+        ]).astype(np.float16)
+        WordVectorTable(keys, np.arange(len(keys), dtype=np.int32), vectors).save()
+
+
+class ParsingTests(SimpleTestCase):
+    """Strings from treks.json."""
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("12-16 days"), (12, 16))
+        self.assertEqual(parse_duration("5-7 days (via Dhunche)"), (5, 7))
+        self.assertEqual(parse_duration("15-22 days (longer if crossing Tashi Lapcha pass)"), (15, 22))
+        self.assertEqual(parse_duration(""), (None, None))
+
+    def test_parse_elevation_range(self):
+        everest = {'max_elevation': '5,545m (Kala Patthar) / 5,364m (EBC)', 'min_elevation': '2,860m (Lukla)'}
+        self.assertEqual(parse_elevation_range(everest), (2860, 5545))
+        three_passes = {
+            'max_elevation': '5,545m (Kala Patthar), Passes: Kongma La(5,535m), Cho La(5,420m), Renjo La(5,360m)',
+            'min_elevation': '2,860m (Lukla)',
+        }
+        self.assertEqual(parse_elevation_range(three_passes), (2860, 5545))
+        mardi = {'max_elevation': '4,500m (Base Camp), 4,200m (High Camp)', 'min_elevation': 'Approx 1,650m (Kande) / 1,100m (Siwai)'}
+        self.assertEqual(parse_elevation_range(mardi), (1100, 4500))
+        self.assertEqual(parse_elevation_range(None), (None, None))
+
+    def test_parse_daily_cost(self):
+        everest = {'accommodation': '$5-$15/night (teahouse)', 'food': '$25-$45/day (increases with altitude)'}
+        self.assertEqual(parse_daily_cost(everest), (30, 60))
+        # An unpriced item leaves only the other one
+        arun = {'accommodation': 'Basic teahouses/homestays, possible camping sections.', 'food': '$20-$35/day'}
+        self.assertEqual(parse_daily_cost(arun), (20, 35))
+        self.assertEqual(parse_daily_cost({'guide': '$25/day'}), (None, None))
+
+    def test_season_bitmask(self):
+        self.assertEqual(season_bitmask(['March-May', 'September-November']), 0b011100011100)
+        self.assertEqual(season_bitmask(['September-October (avoid snow on passes)']), 0b001100000000)
+        # Ranges wrap the year end
+        self.assertEqual(season_bitmask(['September-May']), 0b111100011111)
+        self.assertEqual(season_bitmask(None), 0)
+
+    def test_qualified_months(self):
+        self.assertEqual(parse_season_months(['mid-March to May']), {3, 4, 5})
+        self.assertEqual(parse_season_months(['Late September - early December']), {9, 10, 11, 12})
+        self.assertEqual(parse_season_months(['March, May']), {3, 5})
+        self.assertEqual(parse_season_months(['Marsyangdi valley in Oct']), {10})
+
+
+class SparseFieldsetTests(CatalogTestCase):
+    """`?fields=` and `?compact=` on endpoints that nest a trek."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='walker')
+        profile = UserProfile.objects.create(user=cls.user, display_name='Walker')
+        cls.trek = Trek.objects.create(**catalog_treks(1)[0])
+        Favorite.objects.create(user=profile, trek=cls.trek)
+        # bulk_create skips save(), which uploads a QR code
+        TimsApplication.objects.bulk_create([TimsApplication(
+            user=profile, trek=cls.trek, tims_card_no='TIMS1', transaction_id='T1', image='https://example.com/a.jpg',
+            full_name='Walker', nationality='NP', passport_number='P1', gender='F',
+            trekker_area='Khumbu', route='Lukla', nepal_contact_name='A', nepal_organization='B',
+            nepal_mobile='1', nepal_address='C', home_contact_name='D', home_city='E',
+            home_mobile='2', home_address='F', transit_pass_cost={},
+        )])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_without_trek(self):
+        for url, fields in (('/api/favorites/', 'id'), ('/api/favorites/', 'created_at'),
+                            ('/api/tims/', 'id'), ('/api/tims/', 'status')):
+            response = self.client.get(f'{url}?fields={fields}')
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(set(response.json()[0]), {'id', fields})
+
+    def test_fields_with_trek(self):
+        favorite = self.client.get('/api/favorites/?fields=id,trek').json()[0]
+        self.assertEqual(favorite['trek']['name'], self.trek.name)
+        tims = self.client.get('/api/tims/?fields=status,trek_details').json()[0]
+        self.assertEqual(set(tims), {'id', 'status', 'trek_details'})
+        self.assertEqual(tims['trek_details']['name'], self.trek.name)
+
+    def test_compact(self):
+        full = self.client.get('/api/favorites/').json()[0]['trek']
+        compact = self.client.get('/api/favorites/?compact=trek').json()[0]['trek']
+        self.assertEqual(compact['id'], self.trek.id)
+        self.assertNotIn('itinerary', compact)
+        self.assertIn('itinerary', full)
+        tims = self.client.get('/api/tims/?compact=trek_details&fields=id,trek_details').json()[0]
+        self.assertEqual(set(tims['trek_details']), set(compact))
+
+
+class SearchTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(10)]
+
+    def test_best_match_first(self):
+        results = self.client.get('/api/treks/search/?q=everest base camp').json()['results']
+        self.assertTrue(results)
+        self.assertIn('Everest', results[0]['name'])
+        self.assertIn('<b>', results[0]['snippet'])
+        scores = [result['score'] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_limit_is_clamped(self):
+        for limit, count in (('-1', 1), ('0', 1), ('1', 1), ('1000', 10)):
+            results = self.client.get(f'/api/treks/search/?q=trek&limit={limit}').json()['results']
+            self.assertEqual(len(results), min(count, Trek.objects.count()), limit)
+
+    def test_invalid_limit(self):
+        for url in ('/api/treks/search/?q=trek', '/api/treks/semantic_search/?q=trek', '/api/autocomplete/?prefix=ev'):
+            self.assertEqual(self.client.get(f'{url}&limit=abc').status_code, 400, url)
+
+
+class ConditionalRequestTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(3)]
+
+    def test_repeated_request_is_not_modified(self):
+        for url in ('/api/treks/', f'/api/treks/{self.treks[0].id}/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b'')
+
+    def test_trek_save_changes_etag(self):
+        trek = self.treks[0]
+        for url in ('/api/treks/', f'/api/treks/{trek.id}/'):
+            etag = self.client.get(url)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                trek.name = f"{trek.name} (renamed)"
+                trek.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            body = response.json()
+            names = [item['name'] for item in body['results']] if 'results' in body else [body['name']]
+            self.assertIn(trek.name, names)
+
+    def test_other_trek_keeps_detail_etag(self):
+        url = f'/api/treks/{self.treks[1].id}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.treks[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class SimilarTrekTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(8)]
+
+    def test_build_changes_etag(self):
+        url = f'/api/treks/{self.treks[0].id}/similar/'
+        before = self.client.get(url)
+        self.assertEqual(before.json()['similar_treks'], [])
+        call_command('build_similar_treks', stdout=StringIO())
+        after = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        similar = [trek['id'] for trek in after.json()['similar_treks']]
+        self.assertTrue(similar)
+        self.assertNotIn(self.treks[0].id, similar)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=after['ETag']).status_code, 304)
+
+    def test_incremental_build_matches_full(self):
+        call_command('build_similar_treks', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.treks[0].description = "Frozen lakes and glaciers"
+            self.treks[0].save()
+            self.treks[1].delete()
+            Trek.objects.create(**catalog_treks(9)[8])
+        call_command('build_similar_treks', stdout=StringIO())
+        incremental = list(SimilarTrek.objects.values_list('trek_id', 'rank', 'similar_id'))
+        self.assertNotIn(self.treks[1].id, [row[2] for row in incremental])
+        call_command('build_similar_treks', '--full', stdout=StringIO())
+        self.assertEqual(list(SimilarTrek.objects.values_list('trek_id', 'rank', 'similar_id')), incremental)
+
+
+class PrecomputeTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        treks = [Trek.objects.create(**fields) for fields in catalog_treks(8)]
+        interests = (['lakes', 'hiking'], ['monastery', 'culture'], ['mountains'], ['wildlife', 'forests'])
+        for i, picked in enumerate(interests):
+            user = User.objects.create(username=f'walker{i}')
+            profile = UserProfile.objects.create(user=user, display_name=user.username, interests=picked)
+            for trek in treks[i:i + 3]:
+                UserTrekInteraction.objects.create(user=profile, trek=trek, interaction_type='like', interaction_weight=3)
+
+    def stored(self):
+        return dict(UserRecommendation.objects.values_list('user_id', 'trek_ids'))
+
+    def test_worker_start_skips_the_database(self):
+        call_command('build_interaction_factors', '--full', stdout=StringIO())
+        get_trek_store()
+        epoch = get_catalog_epoch()
+        with self.assertNumQueries(0):
+            batch._init_worker(TrekEmbeddingStore.directory(), epoch, 0.3)
+        self.assertIsNotNone(batch._worker_state['factors'])
+
+    def test_worker_pool_matches_in_process(self):
+        call_command('build_interaction_factors', '--full', stdout=StringIO())
+        self.assertEqual(precompute_recommendations(top_n=3, chunk_size=2, workers=1), 4)
+        in_process = self.stored()
+        self.assertTrue(all(in_process.values()))
+        UserRecommendation.objects.all().delete()
+        self.assertEqual(precompute_recommendations(top_n=3, chunk_size=2, workers=2), 4)
+        self.assertEqual(self.stored(), in_process)
+
+
+class ClusterLabelTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(9)]
+
+    def test_save_leaves_the_store_alone(self):
+        call_command('cluster_treks', '--clusters', '3', stdout=StringIO())
+        generation = TrekEmbeddingStore.current()['generation']
+        with self.captureOnCommitCallbacks(execute=True):
+            Trek.objects.create(**catalog_treks(10)[9])
+        self.assertEqual(TrekEmbeddingStore.current()['generation'], generation)
+
+    def test_assign_labels_saved_treks(self):
+        call_command('cluster_treks', '--clusters', '3', stdout=StringIO())
+        self.assertFalse(Trek.objects.filter(cluster_label__isnull=True).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            trek = Trek.objects.create(**catalog_treks(10)[9])
+        self.assertIsNone(Trek.objects.get(id=trek.id).cluster_label)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('cluster_treks', '--assign', stdout=StringIO())
+        label = Trek.objects.get(id=trek.id).cluster_label
+        self.assertIn(label, range(3))
+        self.assertEqual(self.client.get(f'/api/treks/{trek.id}/').json()['cluster_label'], label)
+        ids = [item['id'] for item in self.client.get(f'/api/treks/?cluster={label}&page_size=20').json()['results']]
+        self.assertIn(trek.id, ids)
+
+
+class TrekStoreTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(6)]
+
+    def test_unchanged_catalog_skips_the_checks(self):
+        store = get_trek_store()
+        with self.assertNumQueries(0), mock.patch.object(TrekEmbeddingStore, 'current') as current:
+            self.assertIs(get_trek_store(), store)
+        current.assert_not_called()
+
+    def test_changes_are_applied_incrementally(self):
+        store = get_trek_store()
+        trek = self.treks[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            trek.description = "Frozen lakes and glaciers"
+            trek.save()
+            self.treks[1].delete()
+        refreshed = get_trek_store()
+        self.assertGreater(refreshed.version, store.version)
+        self.assertGreater(refreshed.generation, store.generation)
+        self.assertEqual(refreshed.ids.tolist(), [t.id for t in self.treks if t.id != self.treks[1].id])
+        changed = refreshed.ids.tolist().index(trek.id)
+        self.assertFalse(np.allclose(refreshed.matrix[changed], store.matrix[list(store.ids).index(trek.id)]))
+        # Another process attaches the saved generation instead of rebuilding
+        self.assertEqual(TrekEmbeddingStore.load().generation, refreshed.generation)
+
+    def test_generations(self):
+        store = get_trek_store()
+        mapped = TrekEmbeddingStore.load()
+        for _ in range(3):
+            store.save()
+        self.assertEqual(TrekEmbeddingStore.current()['generation'], mapped.generation + 3)
+        directory = TrekEmbeddingStore.directory()
+        kept = sorted(name for name in os.listdir(directory) if name.startswith('trek_store.'))
+        self.assertEqual(kept, [f'trek_store.{mapped.generation + 2}', f'trek_store.{mapped.generation + 3}'])
+        # A worker still mapping a removed generation keeps reading it
+        np.testing.assert_array_equal(mapped.matrix, store.matrix)
+        self.assertEqual(TrekEmbeddingStore.load().generation, mapped.generation + 3)
+
+
+class KeysetPaginationTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='walker')
+        profile = UserProfile.objects.create(user=cls.user, display_name='Walker')
+        trek = Trek.objects.create(**catalog_treks(1)[0])
+        tied = timezone.now()
+        for i in range(10):
+            # Seven posts share a timestamp, so only the id orders them
+            created_at = tied if i < 7 else tied - timedelta(minutes=i)
+            Post.objects.create(trek=trek, user=profile, content=f"Post {i}", created_at=created_at)
+
+    def test_walk_with_tied_created_at(self):
+        self.client.force_authenticate(self.user)
+        seen = []
+        url = '/api/posts/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            seen += [post['id'] for post in page['results']]
+            url = page['next']
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/posts/?cursor=nonsense').status_code, 404)
+
+    def test_walk_trek_catalog(self):
+        for fields in catalog_treks(8)[1:]:
+            Trek.objects.create(**fields)
+        seen = []
+        url = '/api/treks/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            seen += [trek['id'] for trek in page['results']]
+            url = page['next']
+        self.assertEqual(seen, list(Trek.objects.order_by('id').values_list('id', flat=True)))
+
+
+class StoredJsonTests(CatalogTestCase):
+    """Responses assembled from TrekBlob bytes match what DRF renders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(5)]
+
+    def assertSameBytes(self, url):
+        # An empty `expand` keeps the default fields but goes through the serializer
+        stored = self.client.get(url)
+        rendered = self.client.get(url + ('&' if '?' in url else '?') + 'expand=')
+        self.assertEqual(stored.status_code, 200)
+        self.assertEqual(stored.content, rendered.content)
+
+    def test_list(self):
+        self.assertSameBytes('/api/treks/')
+        # `next` links carry the query string, so compare the results only
+        stored = self.client.get('/api/treks/?page_size=2')
+        rendered = self.client.get('/api/treks/?page_size=2&expand=')
+        self.assertIsNotNone(stored.json()['next'])
+        self.assertEqual(stored.content.partition(b',"results":')[2], rendered.content.partition(b',"results":')[2])
+
+    def test_detail(self):
+        for trek in self.treks:
+            self.assertSameBytes(f'/api/treks/{trek.id}/')
+
+    def test_after_save(self):
+        trek = self.treks[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            trek.best_seasons = ['mid-March to May']
+            trek.save()
+        self.assertSameBytes(f'/api/treks/{trek.id}/')
+        self.assertEqual(self.client.get(f'/api/treks/{trek.id}/').json()['season_months'], 0b11100)
+
+    def test_after_delete(self):
+        trek = self.treks[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            trek.delete()
+        self.assertEqual(self.client.get(f'/api/treks/{trek.id}/').status_code, 404)
+        self.assertNotIn(trek.id, [item['id'] for item in self.client.get('/api/treks/').json()['results']])
+
+
+class RecommendationTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(10)]
+        cls.user = User.objects.create(username='walker')
+        cls.profile = UserProfile.objects.create(user=cls.user, display_name='Walker', interests=['lakes', 'monastery'])
+
+    def test_matches_per_trek_scoring(self):
+        self.client.force_authenticate(self.user)
+        recommended = [trek['id'] for trek in self.client.get('/api/recommendations/treks/').json()['recommended_treks']]
+        user_vector = recommend.interest_vector(self.profile.interests)
+        scores = {}
+        for trek in self.treks:
+            vector = recommend.compute_average_vector_from_text(recommend.build_trek_text(trek))
+            scores[trek.id] = float(user_vector @ (vector / np.linalg.norm(vector)))
+        self.assertEqual(recommended, sorted(scores, key=scores.get, reverse=True)[:6])
+
+    def test_store_is_persisted(self):
+        store = get_trek_store()
+        loaded = TrekEmbeddingStore.load()
+        self.assertEqual(loaded.ids.tolist(), sorted(trek.id for trek in self.treks))
+        np.testing.assert_array_equal(loaded.matrix, store.matrix)
+        self.assertEqual(loaded.version, store.version)
+
+
+class WordVectorTableTests(SimpleTestCase):
+
+    def setUp(self):
+        self.nlp = spacy.blank('en')
+        for i, word in enumerate(('lake', 'monastery', 'pass', 'Everest', 'yak')):
+            self.nlp.vocab.set_vector(word, np.full(4, i + 1, dtype=np.float32))
+
+    def test_build_keeps_text_words(self):
+        table = WordVectorTable.build(self.nlp, ["Lake and monastery"], general_words=1)
+        strings = self.nlp.vocab.strings
+        # The text's words plus one general lowercase word
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.vectors.dtype, np.float16)
+        np.testing.assert_array_equal(table.average([strings['lake'], strings['monastery']]), [1.5] * 4)
+        np.testing.assert_array_equal(table.average([strings.add('unknown')]), [0] * 4)
+
+    def test_save_and_load(self):
+        table = WordVectorTable.build(self.nlp, ["yak pass"], general_words=0)
+        with tempfile.TemporaryDirectory() as directory:
+            table.save(directory)
+            loaded = WordVectorTable.load(directory)
+            self.assertEqual(loaded.keys.tolist(), table.keys.tolist())
+            orth = self.nlp.vocab.strings['yak']
+            np.testing.assert_array_equal(loaded.average([orth]), table.average([orth]))
+            del loaded
+        self.assertIsNone(WordVectorTable.load(directory))
+
+
+class InterestVectorTests(RecommenderTestCase):
+
+    def test_vector_follows_interests(self):
+        user = User.objects.create(username='walker')
+        profile = UserProfile.objects.create(user=user, display_name='Walker', interests=['Lakes', 'hiking'])
+        stored = bytes(profile.interest_vector)
+        self.assertEqual(len(np.frombuffer(stored, dtype=np.float32)), 16)
+
+        with mock.patch.object(recommend, 'compute_average_vector_from_text') as embed:
+            profile.display_name = 'Walker W.'
+            profile.save()
+            # Same interests in another order and case share the vector
+            recommend._interest_vectors.clear()
+            profile.interests = ['hiking', 'lakes']
+            profile.save()
+        embed.assert_not_called()
+
+        profile.interests = ['monastery']
+        profile.save()
+        profile.refresh_from_db()
+        self.assertNotEqual(bytes(profile.interest_vector), stored)
+        self.assertEqual(profile.interests_key, recommend.interests_key(['monastery']))
+
+
+class CollaborativeFilteringTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(8)]
+        cls.profiles = []
+        for i in range(4):
+            user = User.objects.create(username=f'walker{i}')
+            cls.profiles.append(UserProfile.objects.create(user=user, display_name=user.username))
+        # Two tastes: the first four treks and the last four
+        for profile, treks in zip(cls.profiles, (cls.treks[:3], cls.treks[:4], cls.treks[4:7], cls.treks[4:])):
+            for trek in treks:
+                UserTrekInteraction.objects.create(user=profile, trek=trek, interaction_type='like', interaction_weight=3)
+
+    def recommended(self, profile):
+        self.client.force_authenticate(profile.user)
+        return [trek['id'] for trek in self.client.get('/api/recommendations/treks/').json()['recommended_treks']]
+
+    def test_interactions_alone_recommend(self):
+        call_command('build_interaction_factors', '--full', '--components', '2', stdout=StringIO())
+        recommended = self.recommended(self.profiles[0])
+        self.assertTrue(recommended)
+        self.assertIn(self.treks[3].id, recommended[:4])
+
+    def test_refresh_folds_in_new_users(self):
+        call_command('build_interaction_factors', '--full', '--components', '2', stdout=StringIO())
+        user = User.objects.create(username='newcomer')
+        newcomer = UserProfile.objects.create(user=user, display_name='Newcomer')
+        self.assertEqual(self.recommended(newcomer), [])
+        UserTrekInteraction.objects.create(user=newcomer, trek=self.treks[7], interaction_type='favorite', interaction_weight=5)
+        call_command('build_interaction_factors', stdout=StringIO())
+        self.assertIn(self.treks[4].id, self.recommended(newcomer)[:4])
+
+
+class TrekFilterTests(RecommenderTestCase):
+    """The store's attribute masks agree with the SQL filters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(15)]
+        cls.user = User.objects.create(username='walker')
+        UserProfile.objects.create(user=cls.user, display_name='Walker', interests=['lakes'])
+
+    FILTERS = (
+        'difficulty=Moderate,Challenging', 'region=annapurna', 'district=solukhumbu', 'month=October',
+        'min_days=14', 'max_days=10', 'max_elevation=4500', 'max_daily_cost=30',
+        'difficulty=Strenuous&month=3&max_days=20',
+    )
+
+    def test_mask_matches_queryset(self):
+        store = get_trek_store()
+        for query in self.FILTERS:
+            filters = trek_filters_from_params(QueryDict(query))
+            expected = set(filter_trek_queryset(Trek.objects.all(), filters).values_list('id', flat=True))
+            self.assertEqual(set(store.ids[store.filter_mask(filters)].tolist()), expected, query)
+
+    def test_filtered_recommendations(self):
+        self.client.force_authenticate(self.user)
+        store = get_trek_store()
+        scores = dict(zip(store.ids.tolist(), (store.matrix @ recommend.interest_vector(['lakes'])).tolist()))
+        for query in self.FILTERS:
+            matching = filter_trek_queryset(Trek.objects.all(), trek_filters_from_params(QueryDict(query)))
+            # Best six matches, of those scoring above zero
+            expected = sorted((i for i in matching.values_list('id', flat=True) if scores[i] > 0), key=scores.get, reverse=True)[:6]
+            body = self.client.get(f'/api/recommendations/treks/?{query}').json()
+            self.assertEqual([trek['id'] for trek in body['recommended_treks']], expected, query)
+
+    def test_invalid_filters(self):
+        for query in ('month=Smarch', 'max_days=many'):
+            self.assertEqual(self.client.get(f'/api/treks/?{query}').status_code, 400, query)
+
+
+class SeasonFilterTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(10)]
+
+    def listed(self, query):
+        return {trek['id'] for trek in self.client.get(f'/api/treks/?page_size=50&{query}').json()['results']}
+
+    def test_month(self):
+        october = {trek.id for trek in self.treks if 10 in parse_season_months(trek.best_seasons)}
+        self.assertTrue(october)
+        self.assertEqual(self.listed('month=10'), october)
+        self.assertEqual(self.listed('month=oct'), october)
+
+    def test_open_now(self):
+        for month in (1, 7):
+            with mock.patch('django.utils.timezone.localdate', return_value=date(2026, month, 15)), \
+                    mock.patch('django.utils.timezone.now', return_value=datetime(2026, month, 15, tzinfo=dt_timezone.utc)):
+                self.assertEqual(self.listed('open_now=true'), self.listed(f'month={month}'))
+        # A given month wins over open_now
+        self.assertEqual(self.listed('open_now=true&month=10'), self.listed('month=10'))
+
+
+class SemanticSearchTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(10)]
+
+    def test_closest_first(self):
+        trek = self.treks[3]
+        body = self.client.get(f'/api/treks/semantic_search/?q={trek.name}&limit=3').json()
+        scores = [result['score'] for result in body['results']]
+        self.assertLessEqual(len(scores), 3)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        vector = recommend.query_vector(trek.name)
+        store = get_trek_store()
+        best = store.ids[np.argmax(store.matrix @ vector)]
+        self.assertEqual(body['results'][0]['id'], best)
+
+    def test_filters_and_unknown_words(self):
+        results = self.client.get('/api/treks/semantic_search/?q=lakes&difficulty=Moderate&limit=100').json()['results']
+        self.assertTrue(all(result['difficulty'] == 'Moderate' for result in results))
+        self.assertEqual(self.client.get('/api/treks/semantic_search/?q=zzzxq').json()['results'], [])
+        self.assertEqual(self.client.get('/api/treks/semantic_search/').status_code, 400)
+
+
+class AutocompleteTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(10)]
+
+    def suggest(self, query, **headers):
+        return self.client.get(f'/api/autocomplete/?{query}', **headers)
+
+    def test_word_prefixes(self):
+        everest = next(trek for trek in self.treks if trek.name.startswith('Everest'))
+        suggestions = self.suggest('prefix=base%20ca').json()['suggestions']
+        self.assertIn(everest.name, [suggestion['text'] for suggestion in suggestions])
+        # Matches at the start of a label come first, in any case
+        first = self.suggest('prefix=EVER').json()['suggestions'][0]
+        self.assertTrue(first['text'].lower().startswith('ever'))
+        self.assertIn(everest.id, [s['trek_ids'] for s in self.suggest('prefix=ever').json()['suggestions'] if s['text'] == everest.name][0])
+        self.assertEqual(self.suggest('prefix=').json()['suggestions'], [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest('prefix=a&limit=2').json()['suggestions']), 2)
+        self.assertEqual(len(self.suggest('prefix=a&limit=-5').json()['suggestions']), 1)
+
+    def test_follows_catalog_and_rebuilds(self):
+        response = self.suggest('prefix=zan')
+        self.assertEqual(response.json()['suggestions'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.treks[0].name = 'Zanskar Traverse'
+            self.treks[0].save()
+        again = self.suggest('prefix=zan', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['suggestions'][0]['text'], 'Zanskar Traverse')
+        self.assertEqual(self.suggest('prefix=zan', HTTP_IF_NONE_MATCH=again['ETag']).status_code, 304)
+        # A rebuild at the same catalog version is a new generation too
+        call_command('build_autocomplete', stdout=StringIO())
+        self.assertEqual(self.suggest('prefix=zan', HTTP_IF_NONE_MATCH=again['ETag']).status_code, 200)
+
+
+class ResponseCacheTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(4)]
+
+    def test_hit_skips_the_database(self):
+        for url in ('/api/treks/', f'/api/treks/{self.treks[0].id}/', '/api/treks/?fields=name'):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                again = self.client.get(url)
+            self.assertEqual(again.content, first.content)
+            self.assertEqual(again['ETag'], first['ETag'])
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_catalog_write_invalidates(self):
+        url = f'/api/treks/{self.treks[0].id}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.treks[0].name = 'Renamed Trek'
+            self.treks[0].save()
+        self.assertEqual(self.client.get(url).json()['name'], 'Renamed Trek')
+
+    def test_new_labels_invalidate(self):
+        trek = self.treks[1]
+        url = f'/api/treks/{trek.id}/'
+        self.assertIsNone(self.client.get(url).json()['cluster_label'])
+        # What cluster_treks does, without a catalog write
+        with self.captureOnCommitCallbacks(execute=True):
+            Trek.objects.filter(id=trek.id).update(cluster_label=2)
+            rebuild_trek_blobs([trek.id])
+            publish_catalog_labels()
+        self.assertEqual(self.client.get(url).json()['cluster_label'], 2)
+        self.assertIn(trek.id, [item['id'] for item in self.client.get('/api/treks/?cluster=2').json()['results']])
+
+
+class SyncTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(5)]
+
+    def sync(self, query=''):
+        return self.client.get(f'/api/treks/sync/?{query}').json()
+
+    def test_full_then_delta(self):
+        first = self.sync()
+        self.assertTrue(first['full'])
+        self.assertEqual([trek['id'] for trek in first['treks']], [trek.id for trek in self.treks])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.treks[2].name = 'Renamed Trek'
+            self.treks[2].save()
+            deleted_id = self.treks[3].id
+            self.treks[3].delete()
+        delta = self.sync(f"since={first['version']}&epoch={first['epoch']}")
+        self.assertFalse(delta['full'])
+        self.assertEqual([trek['name'] for trek in delta['treks']], ['Renamed Trek'])
+        self.assertEqual(delta['deleted'], [deleted_id])
+        self.assertGreater(delta['version'], first['version'])
+
+        caught_up = self.sync(f"since={delta['version']}&epoch={delta['epoch']}")
+        self.assertEqual((caught_up['treks'], caught_up['deleted']), ([], []))
+
+    def test_unknown_state_gets_everything(self):
+        version = self.sync()['version']
+        for query in (f'since={version}&epoch=0000', f'since={version + 100}', 'since=-3'):
+            body = self.sync(query)
+            self.assertTrue(body['full'], query)
+            self.assertEqual(len(body['treks']), len(self.treks), query)
+        self.assertEqual(self.client.get('/api/treks/sync/?since=x').status_code, 400)
+
+    def test_gzip(self):
+        response = self.client.get('/api/treks/sync/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.sync())
+
+
+class OfflineBundleTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(5)]
+        EmergencyContactPoint.objects.create(name='Lukla Police', type='police', phone='1', latitude=27.69, longitude=86.73)
+
+    def download(self, **headers):
+        response = self.client.get('/api/offline-bundle/', **headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_contents(self):
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        with tempfile.NamedTemporaryFile(suffix='.sqlite') as f:
+            f.write(content)
+            f.flush()
+            bundle = sqlite3.connect(f.name)
+            self.assertEqual([row[0] for row in bundle.execute("SELECT id FROM treks ORDER BY id")], [t.id for t in self.treks])
+            self.assertEqual(bundle.execute("SELECT name FROM emergency_contacts").fetchall(), [('Lukla Police',)])
+            self.assertTrue(bundle.execute("SELECT COUNT(*) FROM route_points").fetchone()[0])
+            detail = json.loads(bundle.execute("SELECT detail FROM treks WHERE id = ?", [self.treks[0].id]).fetchone()[0])
+            self.assertEqual(detail['name'], self.treks[0].name)
+            bundle.close()
+
+    def test_ranges(self):
+        response, content = self.download()
+        etag, size = response['ETag'], len(content)
+        for header, start, end in (('bytes=0-99', 0, 99), ('bytes=100-', 100, size - 1), ('bytes=-50', size - 50, size - 1)):
+            partial, body = self.download(HTTP_RANGE=header)
+            self.assertEqual(partial.status_code, 206, header)
+            self.assertEqual(partial['Content-Range'], f'bytes {start}-{end}/{size}')
+            self.assertEqual(body, content[start:end + 1], header)
+        self.assertEqual(self.download(HTTP_RANGE=f'bytes={size}-')[0].status_code, 416)
+        # A stale If-Range gets the whole (new) file
+        stale, body = self.download(HTTP_RANGE='bytes=0-99', HTTP_IF_RANGE='"old"')
+        self.assertEqual((stale.status_code, body), (200, content))
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+
+    def test_rebuilt_after_changes(self):
+        etag = self.download()[0]['ETag']
+        EmergencyContactPoint.objects.create(name='Namche Clinic', type='hospital', phone='2', latitude=27.8, longitude=86.71)
+        response = self.download(HTTP_IF_NONE_MATCH=etag)[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BatchTests(TransactionTestCase):
+    """Sub-requests run on their own threads and connections, so the data must be committed."""
+
+    def setUp(self):
+        self.enterContext(override_settings(CACHES=TEST_CACHES, RECOMMENDER_DATA_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        caches['default'].clear()
+        caches['shared'].clear()
+        self.treks = [Trek.objects.create(**fields) for fields in catalog_treks(3)]
+        self.user = User.objects.create(username='walker')
+        profile = UserProfile.objects.create(user=self.user, display_name='Walker')
+        Favorite.objects.create(user=profile, trek=self.treks[1])
+        self.client = APIClient()
+
+    def batch(self, requests):
+        return self.client.post('/api/batch/', {'requests': requests}, format='json')
+
+    def test_responses_in_order(self):
+        self.client.force_authenticate(self.user)
+        trek = self.treks[0]
+        response = self.batch([
+            {'id': 'detail', 'url': f'/api/treks/{trek.id}/'},
+            {'id': 'list', 'url': '/api/treks/?fields=name'},
+            {'id': 'favorites', 'url': '/api/favorites/?compact=trek'},
+            {'id': 'missing', 'url': '/api/nowhere/'},
+            {'id': 'nested', 'url': '/api/batch/'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([item['id'] for item in responses], ['detail', 'list', 'favorites', 'missing', 'nested'])
+        self.assertEqual([item['status'] for item in responses], [200, 200, 200, 404, 404])
+        self.assertEqual(responses[0]['body'], self.client.get(f'/api/treks/{trek.id}/').json())
+        self.assertEqual(len(responses[1]['body']['results']), 3)
+        self.assertEqual([favorite['trek']['id'] for favorite in responses[2]['body']], [self.treks[1].id])
+
+    def test_runs_as_the_caller(self):
+        responses = self.batch([{'id': 1, 'url': '/api/favorites/'}, {'id': 2, 'url': '/api/treks/'}]).json()['responses']
+        self.assertEqual([item['status'] for item in responses], [401, 200])
+
+    def test_invalid_batches(self):
+        for requests in ([], [{'id': 1}], [{'id': 1, 'url': 'https://example.com/'}], [{'url': '/api/treks/'}] * 21):
+            self.assertEqual(self.batch(requests).status_code, 400)
+
+
+class BenchmarkTests(RecommenderTestCase):
+
+    def test_report(self):
+        out = StringIO()
+        call_command('benchmark_recommender', '--sizes', '40', '--users', '30', '--chunk-size', '10', '--cold-runs', '2', stdout=out)
+        result, = json.loads(out.getvalue())['results']
+        self.assertEqual((result['treks'], result['users'], result['dim']), (40, 30, 16))
+        self.assertEqual(result['warm']['count'], 30)
+        self.assertEqual(result['batch']['chunks']['count'], 3)
+        # Synthetic data never reaches the database
+        self.assertFalse(Trek.objects.exists())
+
+
+class LazyModelTests(RecommenderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [Trek.objects.create(**fields) for fields in catalog_treks(5)]
+        cls.user = User.objects.create(username='walker')
+        UserProfile.objects.create(user=cls.user, display_name='Walker', interests=['lakes'])
+
+    def test_serving_never_loads_the_model(self):
+        recommend._nlp = None
+        self.client.force_authenticate(self.user)
+        with mock.patch('spacy.load', side_effect=AssertionError("spaCy model loaded")):
+            self.assertEqual(self.client.get('/api/recommendations/treks/').status_code, 200)
+            self.assertEqual(self.client.get('/api/treks/semantic_search/?q=lakes').status_code, 200)
+            self.assertEqual(self.client.get('/api/treks/search/?q=lakes').status_code, 200)
+        self.assertIsNone(recommend._nlp)
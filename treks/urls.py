@@ -23,6 +23,9 @@ urlpatterns = [
     path('users/<int:id>/', views.UserProfileDetailView.as_view()),
 
     path('interactions/', views.UserTrekInteractionView.as_view()),
+    path('autocomplete/', views.AutocompleteView.as_view()),
+    path('offline-bundle/', views.OfflineBundleView.as_view()),
+    path('batch/', views.BatchView.as_view()),
 
 ]
 
@@ -3,6 +3,8 @@ import math
 import os
 import qrcode
 import base64
+import threading
+from collections import OrderedDict
 from io import BytesIO
 
 def columnar_encrypt(text, key="TREK"):
@@ -217,4 +219,34 @@ def columnar_decrypt(cipher_text, key="TREK"):
     except Exception as e:
         raise Exception(f"Decryption failed: {e}")
 
-google_places_service = GooglePlacesService()
\ No newline at end of file
+google_places_service = GooglePlacesService()
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -1,6 +1,18 @@
 from .models import *
 from .serializers import *
 from .serializers import UserSignupSerializer, SOSAlertSerializer
+from .recommend import recommend_treks, precomputed_recommendations
+from .filters import trek_filters_from_params, filter_trek_queryset, limit_from_params
+from .similar import similar_treks
+from .search import search_treks, semantic_search
+from .autocomplete import get_autocomplete_index
+from .conditional import catalog_condition, trek_condition, similar_condition, autocomplete_condition
+from .response_cache import cached_catalog_response
+from .sync import catalog_delta
+from .bundle import get_offline_bundle, ranged_file_response
+from .subrequests import run_subrequests
+from .blobs import trek_list_items, trek_detail_json, paginated_list_body
+from .pagination import KeysetPagination, ThreadKeysetPagination, IdKeysetPagination, RecentIdKeysetPagination
 
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.permissions import IsAuthenticated
@@ -8,10 +20,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
 
+from django.conf import settings
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 from datetime import timedelta
 import random
+import gzip
+import os
 
 class RecommendationViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
@@ -21,8 +40,15 @@ class RecommendationViewSet(viewsets.ViewSet):
         try:
             profile = request.user.profile
             print(f"Fetching recommendations for user: {profile.user.username} with interests: {profile.interests}")
-            recommended = recommend_treks(profile)
-            serializer = TrekSerializer(recommended, many=True)
+            filters = trek_filters_from_params(request.query_params)
+            # Stored recommendations are unfiltered
+            recommended = None if filters else precomputed_recommendations(profile)
+            if recommended is None:
+                recommended = recommend_treks(profile, filters=filters)
+            # Full treks unless the client asks for ?compact=recommended_treks
+            compact = request.query_params.get('compact', '').split(',')
+            serializer_class = TrekListSerializer if 'recommended_treks' in compact else TrekSerializer
+            serializer = serializer_class(recommended, many=True, context={'request': request})
             return Response({
                 "success": True,
                 "recommended_treks": serializer.data
@@ -299,19 +325,149 @@ class TrekViewSet(viewsets.ModelViewSet):
     queryset = Trek.objects.all()
     serializer_class = TrekSerializer
     lookup_field = 'id'
+    pagination_class = IdKeysetPagination
     
 
+    # Compact representation for the catalog-style endpoints
+    list_actions = ('list', 'search', 'semantic_search', 'similar')
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return TrekListSerializer
+        return TrekSerializer
+
     def get_queryset(self):
         queryset = Trek.objects.all()
+        if self.request.method == 'GET':
+            queryset = queryset.only(*self.get_serializer_class().only_fields(self.request))
+
+        cluster = self.request.query_params.get('cluster')
+        if cluster is not None:
+            try:
+                queryset = queryset.filter(cluster_label=int(cluster))
+            except ValueError:
+                raise ValidationError({'cluster': 'Must be an integer.'})
+
+        queryset = filter_trek_queryset(queryset, trek_filters_from_params(self.request.query_params))
+
         return queryset.order_by('id')
 
+    def uses_stored_json(self, request):
+        """Default fields in JSON: the stored TrekBlob bytes are the response."""
+        return (
+            request.accepted_renderer.format == 'json'
+            and 'fields' not in request.query_params
+            and 'expand' not in request.query_params
+        )
+
+    @cached_catalog_response
+    @method_decorator(catalog_condition)
+    def list(self, request, *args, **kwargs):
+        if not self.uses_stored_json(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.get_queryset().select_related('blob').only('id', 'blob__list_json')
+        treks = self.paginate_queryset(queryset)
+        body = paginated_list_body(trek_list_items(treks), self.paginator.get_next_link())
+        return HttpResponse(body, content_type='application/json')
+
+    @cached_catalog_response
+    @method_decorator(trek_condition)
+    def retrieve(self, request, *args, **kwargs):
+        if self.uses_stored_json(request) and str(kwargs.get('id', '')).isdigit():
+            body = trek_detail_json(int(kwargs['id']))
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Treks saved or deleted since the client's catalog version, gzipped"""
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'Must be an integer.'})
+        body = catalog_delta(since, request.query_params.get('epoch'))
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(body), content_type='application/json')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @action(detail=True, methods=['get'])
+    @method_decorator(similar_condition)
+    def similar(self, request, id=None):
+        """Treks most similar to this one, from the precomputed neighbour table"""
+        trek = self.get_object()
+        treks = similar_treks(trek.id)
+        serializer = self.get_serializer(treks, many=True)
+        return Response({
+            "success": True,
+            "similar_treks": serializer.data
+        })
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(catalog_condition)
+    def search(self, request):
+        """Full-text search over the catalog, best match first, with highlighted snippets"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        limit = limit_from_params(request.query_params, 20, 100)
+        try:
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            raise ValidationError({'offset': 'Must be an integer.'})
+
+        matches = search_treks(text, limit=limit, offset=max(offset, 0))
+        serializer = self.get_serializer([trek for trek, _, _ in matches], many=True)
+        results = []
+        for data, (_, snippet, score) in zip(serializer.data, matches):
+            data['snippet'] = snippet
+            data['score'] = score
+            results.append(data)
+        return Response({
+            "success": True,
+            "results": results
+        })
+
+    @action(detail=False, methods=['get'])
+    def semantic_search(self, request):
+        """Treks closest in meaning to free text, scored against the trek embeddings"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        limit = limit_from_params(request.query_params, 20, 100)
+
+        matches = semantic_search(text, limit=limit, filters=trek_filters_from_params(request.query_params))
+        serializer = self.get_serializer([trek for trek, _ in matches], many=True)
+        results = []
+        for data, (_, score) in zip(serializer.data, matches):
+            data['score'] = score
+            results.append(data)
+        return Response({
+            "success": True,
+            "results": results
+        })
+
 
 class PostViewSet(viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Post.objects.filter(status='active').order_by('-created_at')
+        queryset = Post.objects.filter(status='active')
+        # Per-trek and per-user feeds page along the (trek|user, -created_at) indexes
+        for param in ('trek', 'user'):
+            value = self.request.query_params.get(param)
+            if value is not None:
+                try:
+                    queryset = queryset.filter(**{f"{param}_id": int(value)})
+                except ValueError:
+                    raise ValidationError({param: 'Must be an integer.'})
+        return queryset.order_by('-created_at', '-id')
 
     def create(self, request, *args, **kwargs):
         try:
@@ -381,9 +537,17 @@ class CommentViewSet(viewsets.ModelViewSet):
    
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ThreadKeysetPagination
 
     def get_queryset(self):
-        return Comment.objects.filter(status='active')
+        queryset = Comment.objects.filter(status='active')
+        post = self.request.query_params.get('post')
+        if post is not None:
+            try:
+                queryset = queryset.filter(post_id=int(post))
+            except ValueError:
+                raise ValidationError({'post': 'Must be an integer.'})
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user.profile)
@@ -419,6 +583,7 @@ class LikeViewSet(viewsets.ModelViewSet):
     serializer_class = LikeSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'post', 'delete']  
+    pagination_class = RecentIdKeysetPagination
 
     def get_queryset(self):
         return Like.objects.filter(user=self.request.user.profile)
@@ -432,15 +597,60 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user.profile).select_related('trek')
+        queryset = Favorite.objects.filter(user=self.request.user.profile)
+        if self.request.method == 'GET':
+            return FavoriteSerializer.restrict_queryset(queryset, self.request)
+        return queryset.select_related('trek')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user.profile)
 
 
+class AutocompleteView(APIView):
+    """Search-as-you-type suggestions: trek names, villages and attractions"""
+
+    @method_decorator(autocomplete_condition)
+    def get(self, request):
+        prefix = request.query_params.get('prefix', '')
+        limit = limit_from_params(request.query_params, 10, 50)
+        return Response({
+            "success": True,
+            "suggestions": get_autocomplete_index().complete(prefix, limit)
+        })
+
+
+class OfflineBundleView(APIView):
+    """SQLite file of the catalog, routes and emergency contacts for offline use"""
+
+    def get(self, request):
+        path = get_offline_bundle()
+        name = os.path.basename(path)
+        return ranged_file_response(request, path, f'"{name[:-len(".sqlite")]}"', 'application/vnd.sqlite3', name)
+
+
+class BatchView(APIView):
+    """Several GET requests in one round trip, run concurrently as the same user"""
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'requests': 'A non-empty list of {"id", "url"} objects is required.'})
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError({'requests': f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.'})
+        pairs = []
+        for position, item in enumerate(items):
+            url = item.get('url') if isinstance(item, dict) else None
+            if not isinstance(url, str) or not url.startswith('/'):
+                raise ValidationError({'requests': f'Request {position} needs a "url" path starting with "/".'})
+            pairs.append((item.get('id', position), url))
+        body = run_subrequests(request, pairs, exclude_view=BatchView)
+        return HttpResponse(body, content_type='application/json')
+
+
 class UserTrekInteractionView(generics.ListCreateAPIView):
     queryset = UserTrekInteraction.objects.all()
     serializer_class = UserTrekInteractionSerializer
+    pagination_class = RecentIdKeysetPagination
 
 
 class TIMSViewSet(viewsets.ModelViewSet):
@@ -450,16 +660,20 @@ class TIMSViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        if self.request.method == 'GET':
+            queryset = TimsApplicationSerializer.restrict_queryset(self.queryset, self.request)
+        else:
+            queryset = self.queryset.select_related('trek')
         
         try:
             user_profile = user.profile
-            return self.queryset.filter(user=user_profile).order_by('-created_at')
+            return queryset.filter(user=user_profile).order_by('-created_at')
         except AttributeError:
             user_profile = UserProfile.objects.create(
                 user=user,
                 display_name=user.username
             )
-            return self.queryset.filter(user=user_profile).order_by('-created_at')
+            return queryset.filter(user=user_profile).order_by('-created_at')
         except Exception as e:
             return self.queryset.none()
 
@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+
+import numpy as np
+from django.conf import settings
+
+WORD_KEYS_FILE = "word_keys.npy"
+WORD_ROWS_FILE = "word_rows.npy"
+WORD_VECTORS_FILE = "word_vectors.npy"
+WORD_VECTORS_META_FILE = "word_vectors.json"
+
+# Interests offered in the app, kept in the table even when no user has
+# picked them yet
+INTEREST_VOCABULARY = [
+    "hiking", "trekking", "camping", "photography", "mountains", "lakes",
+    "glaciers", "rivers", "waterfalls", "forests", "wildlife", "birds",
+    "rhododendron", "flowers", "culture", "history", "heritage", "villages",
+    "monastery", "monasteries", "temples", "buddhism", "pilgrimage", "festivals",
+    "sherpa", "gurung", "tamang", "food", "teahouse", "homestay", "adventure",
+    "climbing", "mountaineering", "passes", "altitude", "snow", "sunrise",
+    "viewpoints", "panorama", "remote", "solitude", "short", "easy", "family",
+    "hot springs", "yoga", "meditation",
+]
+
+
+class WordVectorTable:
+    """
+    Pruned copy of a spaCy vector table. `keys` holds the spaCy orth hashes
+    of the kept words (sorted, so lookups are a searchsorted), `rows` maps
+    each key to a row of the float16 `vectors` array.
+    """
+
+    def __init__(self, keys, rows, vectors, lang="en"):
+        self.keys = keys
+        self.rows = rows
+        self.vectors = vectors
+        self.lang = lang
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def vectors_length(self):
+        return self.vectors.shape[1]
+
+    def average(self, orths):
+        """
+        Mean float32 vector of the tokens found in the table; a zero vector
+        if none of them are.
+        """
+        orths = np.asarray(orths, dtype=np.uint64)
+        if not len(orths) or not len(self.keys):
+            return np.zeros(self.vectors_length, dtype=np.float32)
+        positions = np.searchsorted(self.keys, orths)
+        positions[positions == len(self.keys)] = 0
+        found = positions[self.keys[positions] == orths]
+        if not len(found):
+            return np.zeros(self.vectors_length, dtype=np.float32)
+        return self.vectors[self.rows[found]].astype(np.float32).mean(axis=0)
+
+    @classmethod
+    def build(cls, nlp, texts, general_words=50000):
+        """
+        Keeps every word of `texts` that the model has a vector for, plus the
+        `general_words` most frequent lowercase words of the model.
+        Duplicate rows are shared, as in the source table.
+        """
+        vectors = nlp.vocab.vectors
+        key2row = vectors.key2row
+
+        wanted = set()
+        for text in texts:
+            for token in nlp.make_doc(text.lower()):
+                if token.orth in key2row:
+                    wanted.add(token.orth)
+
+        # Rows of the md/lg tables are ordered by frequency
+        added = 0
+        for key, row in sorted(key2row.items(), key=lambda item: item[1]):
+            if added >= general_words:
+                break
+            word = nlp.vocab.strings[key] if key in nlp.vocab.strings else None
+            if word and word == word.lower() and key not in wanted:
+                wanted.add(key)
+                added += 1
+
+        keys = np.array(sorted(wanted), dtype=np.uint64)
+        source_rows = np.array([key2row[key] for key in keys], dtype=np.int64)
+        unique_rows, rows = np.unique(source_rows, return_inverse=True)
+        table = np.asarray(vectors.data[unique_rows], dtype=np.float16)
+        return cls(keys, rows.astype(np.int32), table, nlp.lang)
+
+    @staticmethod
+    def directory():
+        return settings.RECOMMENDER_DATA_DIR
+
+    def save(self, directory=None):
+        directory = directory or self.directory()
+        os.makedirs(directory, exist_ok=True)
+        for filename, array in (
+            (WORD_KEYS_FILE, self.keys),
+            (WORD_ROWS_FILE, self.rows),
+            (WORD_VECTORS_FILE, self.vectors),
+        ):
+            path = os.path.join(directory, filename)
+            with open(f"{path}.tmp", 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(f"{path}.tmp", path)
+
+        meta_path = os.path.join(directory, WORD_VECTORS_META_FILE)
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({'lang': self.lang, 'words': len(self), 'rows': len(self.vectors)}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory=None):
+        """Memory-maps a saved table, or returns None if none was built."""
+        directory = directory or cls.directory()
+        meta_path = os.path.join(directory, WORD_VECTORS_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        keys = np.load(os.path.join(directory, WORD_KEYS_FILE), mmap_mode='r')
+        rows = np.load(os.path.join(directory, WORD_ROWS_FILE), mmap_mode='r')
+        vectors = np.load(os.path.join(directory, WORD_VECTORS_FILE), mmap_mode='r')
+        if len(keys) != meta['words'] or len(vectors) != meta['rows']:
+            return None
+        return cls(keys, rows, vectors, meta['lang'])
+
+
+_word_vectors = None
+_tokenizer = None
+_word_vectors_lock = threading.Lock()
+
+def get_word_vectors():
+    """
+    The pruned table and a blank tokenizer-only pipeline for its language,
+    loaded on first use. Returns (None, None) if no table has been built.
+    """
+    global _word_vectors, _tokenizer
+    if _word_vectors is None:
+        with _word_vectors_lock:
+            if _word_vectors is None:
+                table = WordVectorTable.load()
+                if table is None:
+                    return None, None
+                import spacy
+                _tokenizer = spacy.blank(table.lang)
+                _word_vectors = table
+    return _word_vectors, _tokenizer